@@ -0,0 +1,179 @@
+"""
+memory-budget admission control for browser work.
+
+a chrome launch costs a few hundred MB and a page load tens more; on a small
+instance a handful of concurrent launches gets the whole container oom-killed.
+before a driver is checked out, the service's rss (this process plus every
+child: chrome, chromedriver, transcript and decode workers) plus what was
+recently admitted but isn't visible in rss yet must leave room for the new
+work under the budget. otherwise the caller waits up to `max_wait` seconds
+for headroom and then gets OverBudget, which routes answer like Throttled
+(503 + Retry-After).
+"""
+import logging
+import os
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+import metrics
+from scheduler import Throttled
+
+logger = logging.getLogger("scraper")
+
+MB = 1024 * 1024
+
+# share of the container's memory limit used when MEMORY_BUDGET_MB isn't set
+DEFAULT_LIMIT_SHARE = 0.85
+
+CGROUP_LIMIT_FILES = ["/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"]
+
+
+class OverBudget(Throttled):
+    """no memory headroom for more browser work within max_wait"""
+
+    def __init__(self, needed_mb, headroom_mb, retry_after):
+        super().__init__("memory", retry_after)
+        self.args = (f"memory budget exhausted (needs {needed_mb:.0f}MB, {max(0, headroom_mb):.0f}MB free), "
+                     f"retry in {retry_after:.0f}s",)
+
+
+def container_limit_mb():
+    """the cgroup memory limit in MB, or None when unlimited or unknown"""
+    for path in CGROUP_LIMIT_FILES:
+        try:
+            with open(path) as f:
+                raw = f.read().strip()
+        except OSError:
+            continue
+        if raw == "max":
+            return None
+        try:
+            limit = int(raw)
+        except ValueError:
+            continue
+        # cgroup v1 reports "unlimited" as a huge page-aligned number
+        return limit / MB if limit < 1 << 60 else None
+    return None
+
+
+def service_rss():
+    """rss of this process and all of its descendants, in bytes"""
+    root = psutil.Process()
+    total = 0
+    for proc in [root, *root.children(recursive=True)]:
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+class MemoryAdmission:
+    """
+    admits browser work while rss + pending reservations + its cost fit the
+    budget. rss lags a chrome launch by a few seconds, so each admission is
+    held as a reservation for `settle_s` before only rss counts. a budget of
+    0 (or no psutil) admits everything.
+    """
+
+    def __init__(self, budget_mb, launch_mb=250, page_mb=60, max_wait=20, settle_s=15, sample_s=0.5):
+        self.budget_mb = budget_mb if psutil is not None else 0
+        self.launch_mb = launch_mb
+        self.page_mb = page_mb
+        self.max_wait = max_wait
+        self.settle_s = settle_s
+        self.sample_s = sample_s
+
+        self._cond = threading.Condition()
+        self._pending = []  # [(expires_at, mb), ...]
+        self._rss_mb = 0.0
+        self._sampled_at = 0.0
+        self._stats = {"admitted": 0, "waited": 0, "rejected": 0}
+
+    @property
+    def enabled(self):
+        return self.budget_mb > 0
+
+    def _rss(self, now):
+        if psutil is None:
+            return 0.0
+        if now - self._sampled_at >= self.sample_s:
+            try:
+                self._rss_mb = service_rss() / MB
+            except psutil.Error as e:
+                logger.warning(f"rss sampling failed: {e}")
+            self._sampled_at = now
+        return self._rss_mb
+
+    def _reserved(self, now):
+        self._pending = [(expires, mb) for expires, mb in self._pending if expires > now]
+        return sum(mb for _, mb in self._pending)
+
+    def admit(self, cost_mb, max_wait=None):
+        """
+        wait until `cost_mb` more fits the budget and reserve it; returns the
+        seconds waited. raises OverBudget once `max_wait` runs out.
+        """
+        if not self.enabled:
+            return 0.0
+        max_wait = self.max_wait if max_wait is None else max_wait
+        started = time.time()
+        deadline = started + max_wait
+        waited = False
+
+        with self._cond:
+            while True:
+                now = time.time()
+                headroom = self.budget_mb - self._rss(now) - self._reserved(now)
+                if cost_mb <= headroom:
+                    self._pending.append((now + self.settle_s, cost_mb))
+                    self._stats["admitted"] += 1
+                    return now - started
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._stats["rejected"] += 1
+                    metrics.ADMISSION_REJECTIONS.inc()
+                    # reservations settle within settle_s; anything else is live browser work
+                    retry_after = min((e for e, _ in self._pending), default=now + self.settle_s) - now
+                    logger.warning(f"browser work rejected: needs {cost_mb}MB, {headroom:.0f}MB headroom")
+                    raise OverBudget(cost_mb, headroom, max(1.0, retry_after))
+
+                if not waited:
+                    waited = True
+                    self._stats["waited"] += 1
+                self._cond.wait(min(self.sample_s, remaining))
+
+    def stats(self):
+        with self._cond:
+            now = time.time()
+            rss = self._rss(now)
+            reserved = self._reserved(now)
+            return {
+                "enabled": self.enabled,
+                "budget_mb": self.budget_mb,
+                "rss_mb": round(rss, 1),
+                "reserved_mb": reserved,
+                "headroom_mb": round(self.budget_mb - rss - reserved, 1) if self.enabled else None,
+                **self._stats,
+            }
+
+
+def admission_from_env():
+    """MEMORY_BUDGET_MB, or DEFAULT_LIMIT_SHARE of the container limit; 0 turns admission off"""
+    budget = os.environ.get("MEMORY_BUDGET_MB")
+    if budget is None:
+        limit = container_limit_mb()
+        budget = int(limit * DEFAULT_LIMIT_SHARE) if limit else 0
+    return MemoryAdmission(
+        budget_mb=int(budget),
+        launch_mb=int(os.environ.get("ADMISSION_LAUNCH_MB", 250)),
+        page_mb=int(os.environ.get("ADMISSION_PAGE_MB", 60)),
+        max_wait=float(os.environ.get("ADMISSION_MAX_WAIT", 20)),
+        settle_s=float(os.environ.get("ADMISSION_SETTLE_S", 15)),
+    )
@@ -0,0 +1,154 @@
+"""
+one-time setup behind every chrome launch.
+
+launching used to redo all of this per driver: a fresh UserAgent() (which can
+fetch its data), undetected_chromedriver detecting chrome and downloading and
+patching a new chromedriver, and ChromeDriverManager().install() on the
+selenium fallback. now the user agent pool is read once from the bundled
+user_agents.txt, chrome's version is detected once, and the patched
+chromedriver is built once per chrome major version into UC_DRIVER_DIR, where
+later launches and restarts reuse it.
+"""
+import logging
+import os
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger("scraper")
+
+USER_AGENTS_FILE = os.environ.get("USER_AGENTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "user_agents.txt"))
+DRIVER_DIR = os.environ.get("UC_DRIVER_DIR", os.path.join(tempfile.gettempdir(), "skeptek-chromedriver"))
+
+_lock = threading.RLock()
+_cache = {}
+
+_CHROME_TOKEN_RE = re.compile(r"Chrome/\d+\.0\.0\.0")
+
+
+def _once(key, build):
+    """build() the first time `key` is asked for; later calls return the same value"""
+    if key in _cache:
+        return _cache[key]
+    with _lock:
+        if key not in _cache:
+            _cache[key] = build()
+        return _cache[key]
+
+
+def user_agents():
+    def _load():
+        try:
+            with open(USER_AGENTS_FILE, encoding="utf-8") as f:
+                agents = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        except OSError as e:
+            logger.warning(f"user agent list unavailable ({e}), keeping chrome's own")
+            return []
+        major = chrome_major()
+        if major:
+            # a user agent older or newer than the browser itself is an easy tell
+            agents = [_CHROME_TOKEN_RE.sub(f"Chrome/{major}.0.0.0", ua) for ua in agents]
+        return list(dict.fromkeys(agents))
+    return _once("user_agents", _load)
+
+
+def random_user_agent():
+    agents = user_agents()
+    return random.choice(agents) if agents else None
+
+
+def random_window_size():
+    return random.randint(1024, 1920), random.randint(768, 1080)
+
+
+def chrome_major():
+    """major version of the installed chrome, or None if it can't be found"""
+    def _detect():
+        try:
+            from undetected_chromedriver import find_chrome_executable
+            binary = find_chrome_executable()
+            if not binary:
+                return None
+            out = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10).stdout
+        except Exception as e:
+            logger.warning(f"chrome version detection failed: {e}")
+            return None
+        match = re.search(r"(\d+)\.\d+\.\d+", out)
+        return int(match.group(1)) if match else None
+    return _once("chrome_major", _detect)
+
+
+def patched_driver_path():
+    """
+    path of an undetected_chromedriver-patched chromedriver for the installed
+    chrome, downloading and patching it only when the cache doesn't have one.
+    None means uc should fall back to doing it itself.
+    """
+    major = chrome_major()
+    if major is None:
+        return None
+
+    def _build():
+        from undetected_chromedriver.patcher import Patcher
+
+        path = os.path.join(DRIVER_DIR, f"chromedriver-{major}")
+        if os.path.exists(path) and Patcher(executable_path=path, version_main=major).is_binary_patched(path):
+            logger.info(f"reusing patched chromedriver {path}")
+            return path
+
+        started = time.time()
+        patcher = Patcher(version_main=major)
+        patcher.auto()
+        os.makedirs(DRIVER_DIR, exist_ok=True)
+        # copy then rename so a concurrent process never runs a half-written binary
+        partial = f"{path}.{os.getpid()}.part"
+        shutil.copy2(patcher.executable_path, partial)
+        os.replace(partial, path)
+        logger.info(f"patched chromedriver {major} built in {time.time() - started:.1f}s: {path}")
+        return path
+
+    try:
+        return _once(("patched_driver", major), _build)
+    except Exception as e:
+        logger.warning(f"patched chromedriver bootstrap failed: {e}")
+        return None
+
+
+def forget_patched_driver():
+    """drop the cached driver (e.g. chrome was updated under us); the next launch rebuilds it"""
+    with _lock:
+        for key in [k for k in _cache if isinstance(k, tuple) and k[0] == "patched_driver"]:
+            path = _cache.pop(key)
+            if path:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        _cache.pop("chrome_major", None)
+        _cache.pop("user_agents", None)
+
+
+def fallback_driver_path():
+    """plain chromedriver for the selenium fallback, resolved by webdriver_manager once per process"""
+    def _install():
+        from webdriver_manager.chrome import ChromeDriverManager
+        started = time.time()
+        path = ChromeDriverManager().install()
+        logger.info(f"chromedriver for the selenium fallback ready in {time.time() - started:.1f}s")
+        return path
+    return _once("fallback_driver", _install)
+
+
+def prepare():
+    """do the one-time work now (image build, startup) instead of on the first launch"""
+    return {"chrome_major": chrome_major(), "user_agents": len(user_agents()), "patched_driver": patched_driver_path()}
+
+
+def since_process_start():
+    """seconds since this process started (interpreter start-up and imports included)"""
+    import psutil
+    return time.time() - psutil.Process().create_time()
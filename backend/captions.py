@@ -0,0 +1,152 @@
+"""
+yt-dlp caption fallback for transcripts.
+
+YoutubeDL instances are kept in a small module-level pool and reused across
+requests, and every caption download goes through the shared pooled http
+session. json3 caption files are parsed
+event by event as they stream in instead of being loaded whole.
+"""
+import json
+import logging
+import os
+import queue
+from contextlib import contextmanager
+
+from http_client import get_session
+
+logger = logging.getLogger("scraper")
+
+YDL_OPTS = {
+    'skip_download': True,
+    'writesubtitles': True,
+    'writeautomaticsub': True,
+    'quiet': True,
+    'no_warnings': True,
+}
+
+# extraction errors that mean the video itself is gone, not that we failed to reach it
+UNAVAILABLE_MARKERS = ("video unavailable", "private video", "has been removed", "account associated with this video has been terminated")
+
+# idle instances kept between requests; a burst may create more, the extras are dropped
+POOL_SIZE = int(os.environ.get("YTDLP_POOL_SIZE", 2))
+
+_idle = queue.LifoQueue()
+
+
+@contextmanager
+def _ydl():
+    """
+    a pooled YoutubeDL. instances carry cookies and caches that aren't safe to
+    share between threads, so each is used by one caller at a time and handed
+    back for the next request instead of being rebuilt.
+    """
+    try:
+        ydl = _idle.get_nowait()
+    except queue.Empty:
+        import yt_dlp
+        ydl = yt_dlp.YoutubeDL(YDL_OPTS)
+    try:
+        yield ydl
+    finally:
+        if _idle.qsize() < POOL_SIZE:
+            _idle.put(ydl)
+        else:
+            ydl.close()
+
+
+def iter_json3_events(chunks):
+    """
+    yield each object of the top-level "events" array of a json3 caption
+    document from an iterable of text chunks, without buffering the document.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    in_events = False
+
+    for chunk in chunks:
+        buf += chunk
+
+        if not in_events:
+            key = buf.find('"events"')
+            bracket = buf.find("[", key) if key != -1 else -1
+            if bracket == -1:
+                # keep enough tail to catch a key split across chunks
+                if key == -1:
+                    buf = buf[-16:]
+                continue
+            buf = buf[bracket + 1:]
+            in_events = True
+
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                return
+            try:
+                event, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # object not complete yet; wait for more bytes
+                break
+            yield event
+        buf = buf[pos:]
+
+
+def events_to_transcript(events):
+    transcript = []
+    for event in events:
+        if 'segs' in event and event['segs']:
+            text = " ".join([s.get('utf8', '') for s in event['segs']]).strip()
+            if text:
+                transcript.append({
+                    'text': text,
+                    'start': event.get('tStartMs', 0) / 1000.0,
+                    'duration': event.get('dDurationMs', 0) / 1000.0
+                })
+    return transcript
+
+
+def fetch_json3(url, timeout=15):
+    res = get_session().get(url, timeout=timeout, stream=True)
+    try:
+        res.raise_for_status()
+        res.encoding = "utf-8"
+        return events_to_transcript(iter_json3_events(res.iter_content(chunk_size=16 * 1024, decode_unicode=True)))
+    finally:
+        res.close()
+
+
+def fetch_transcript_ytdlp(video_id, lang='en'):
+    """
+    fallback using yt-dlp to extract automatic captions.
+    None means youtube has no usable captions for `lang` (or no video at all);
+    network, rate-limit and extractor errors are raised.
+    """
+    url = f"https://www.youtube.com/watch?v={video_id}"
+
+    try:
+        with _ydl() as ydl:
+            info = ydl.extract_info(url, download=False)
+    except Exception as e:
+        if any(marker in str(e).lower() for marker in UNAVAILABLE_MARKERS):
+            logger.info(f"yt-dlp: {video_id} is unavailable")
+            return None
+        raise
+
+    # 1. check automatic captions (most common)
+    captions = (info.get('automatic_captions') or {}).get(lang, [])
+    # 2. check manual subtitles
+    if not captions:
+        captions = (info.get('subtitles') or {}).get(lang, [])
+
+    if not captions:
+        return None
+
+    # prefer json3 format for easy parsing
+    json3_cap = next((c for c in captions if c.get('ext') == 'json3'), None)
+    if json3_cap:
+        return fetch_json3(json3_cap['url'])
+
+    return None
@@ -0,0 +1,46 @@
+"""
+support for serving on gevent (SERVER_MODE=gevent in wsgi.py).
+
+under gevent the stdlib is monkey patched, so requests waiting on sockets,
+sleeps, locks, chromedriver or transcript worker pipes yield to each other
+instead of each pinning a thread. cpu-bound parsing would still stall every
+greenlet, so `offload` runs it on a small pool of real threads (CPU_WORKERS);
+without gevent it's a plain call on the request thread.
+"""
+import os
+import sys
+import threading
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def active():
+    """True once gevent has patched the stdlib; never imports gevent itself"""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("threading")
+
+
+def cpu_workers():
+    return max(1, int(os.environ.get("CPU_WORKERS", os.cpu_count() or 2)))
+
+
+def _cpu_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from gevent.threadpool import ThreadPool
+            _pool = ThreadPool(cpu_workers())
+        return _pool
+
+
+def offload(fn, *args, **kwargs):
+    """fn(*args, **kwargs), on a native thread when serving on gevent; keep fn free of shared state"""
+    if not active():
+        return fn(*args, **kwargs)
+    return _cpu_pool().apply(fn, args, kwargs)
+
+
+def stats():
+    mode = "gevent" if active() else "threads"
+    return {"mode": mode, "cpu_workers": cpu_workers() if mode == "gevent" else None}
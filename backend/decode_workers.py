@@ -0,0 +1,101 @@
+"""
+pool of long-lived video decode worker processes for video_frames.
+
+opencv/ffmpeg decoding runs out of process, so a codec segfault can't take
+the server down and a decode never holds the server's gil. workers start
+from this small module (`python decode_workers.py`, see pipe_workers) and
+only ever import video_frames, opencv and numpy.
+
+requests and results are pickled over the worker's stdin/stdout pipes.
+"""
+import os
+
+import pipe_workers
+from pipe_workers import PipeWorkerPool, Pickled, WorkersBusy, serve
+from scheduler import Throttled
+
+# the only video_frames functions a worker will run
+TASKS = {"_decode_stream", "_decode_file"}
+
+
+class DecodeError(Exception):
+    """
+    the decode task itself failed. `io_error` is set when it failed reading or
+    opening the video (http and range errors, opencv refusing the stream), so
+    another source for the same video may still work.
+    """
+
+    def __init__(self, message, io_error=False):
+        super().__init__(message)
+        self.io_error = io_error
+
+
+class DecodeUnavailable(Throttled):
+    """no worker could run the task (all busy, or it crashed / timed out); routes answer it like Throttled"""
+
+    def __init__(self, message, retry_after=10):
+        super().__init__("video decode", retry_after)
+        self.args = (message,)
+
+
+class DecodeCrashed(DecodeUnavailable):
+    """the worker died or timed out; it has already been killed, so a retry gets a fresh one"""
+
+
+class DecodeWorkerPool(PipeWorkerPool):
+    """
+    at most `size` workers, started on first use; each decodes one video at a
+    time, with the kill / recycle rules of PipeWorkerPool.
+    """
+
+    def __init__(self, size=1, timeout=120, max_tasks=50):
+        super().__init__("decode", __file__, Pickled, size=size, timeout=timeout, max_tasks=max_tasks)
+
+    def run(self, task, *args):
+        """video_frames.<task>(*args) in a worker; raises DecodeError, DecodeUnavailable or DecodeCrashed"""
+        if task not in TASKS:
+            raise ValueError(f"unknown decode task: {task}")
+        try:
+            status, value, io_error = self.request((task, args))
+        except WorkersBusy as e:
+            raise DecodeUnavailable(str(e))
+        except pipe_workers.WorkerCrashed as e:
+            raise DecodeCrashed(str(e))
+
+        if status != "ok":
+            raise DecodeError(value, io_error=io_error)
+        return value
+
+
+def pool_from_env():
+    """build the shared pool from VIDEO_DECODE_* env vars; one worker unless told otherwise"""
+    return DecodeWorkerPool(
+        size=int(os.environ.get("VIDEO_DECODE_WORKERS", 1)),
+        timeout=float(os.environ.get("VIDEO_DECODE_TIMEOUT", 120)),
+        max_tasks=int(os.environ.get("VIDEO_DECODE_MAX_TASKS", 50)),
+    )
+
+
+# worker side
+
+def _worker_loop():
+    import cv2
+    import video_frames
+
+    # requests' errors are IOErrors too
+    io_errors = (OSError, cv2.error)
+
+    def handle(request):
+        task, args = request
+        try:
+            if task not in TASKS:
+                raise ValueError(f"unknown decode task: {task}")
+            return ("ok", getattr(video_frames, task)(*args), False)
+        except Exception as e:
+            return ("error", f"{e.__class__.__name__}: {str(e)[:300]}", isinstance(e, io_errors))
+
+    serve(Pickled, handle)
+
+
+if __name__ == "__main__":
+    _worker_loop()
@@ -0,0 +1,320 @@
+"""
+warm pool of stealth chrome drivers.
+
+launching undetected_chromedriver costs seconds and a few hundred MB, so routes
+check a driver out, use it and hand it back instead of quitting it.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+import metrics
+from scheduler import Throttled
+
+logger = logging.getLogger("scraper")
+
+
+class PoolExhausted(Throttled):
+    """raised when no driver could be checked out within the timeout; routes answer it like Throttled"""
+
+    def __init__(self, waited, retry_after=10):
+        super().__init__("browser pool", retry_after)
+        self.args = (f"no browser available after {waited:.0f}s, retry in {retry_after:.0f}s",)
+
+
+class _Entry:
+    """a live driver plus the bookkeeping needed to decide when to recycle it"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created = time.time()
+        self.pages = 0
+
+
+def _browser_pids(driver):
+    """pids of chromedriver and the browser it controls (uc launches chrome itself)"""
+    pids = []
+    service = getattr(driver, "service", None)
+    process = getattr(service, "process", None) if service else None
+    if process is not None and getattr(process, "pid", None):
+        pids.append(process.pid)
+    browser_pid = getattr(driver, "browser_pid", None)
+    if browser_pid:
+        pids.append(browser_pid)
+    return pids
+
+
+def driver_rss_mb(driver):
+    """resident memory of the whole chrome process tree behind a driver, in MB"""
+    if psutil is None:
+        return None
+    seen = set()
+    total = 0
+    for pid in _browser_pids(driver):
+        try:
+            root = psutil.Process(pid)
+            for proc in [root, *root.children(recursive=True)]:
+                if proc.pid in seen:
+                    continue
+                seen.add(proc.pid)
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+        except psutil.Error:
+            continue
+    return total / (1024 * 1024)
+
+
+def _origin(url):
+    parsed = urlparse(url or "")
+    return f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme in ("http", "https") and parsed.netloc else None
+
+
+def visited_origins(driver):
+    """
+    http(s) origins the tab touched since its last reset: every session history
+    entry (js and meta redirects included), every frame of the current page and
+    every site that set a cookie. plain 3xx hops run no script, so their cookies
+    are all they can leave behind.
+    """
+    origins = {_origin(driver.current_url)}
+
+    history = driver.execute_cdp_cmd("Page.getNavigationHistory", {})
+    origins.update(_origin(entry.get("url")) for entry in history.get("entries", []))
+
+    frames = [driver.execute_cdp_cmd("Page.getFrameTree", {}).get("frameTree", {})]
+    while frames:
+        node = frames.pop()
+        origins.add(_origin(node.get("frame", {}).get("url")))
+        frames.extend(node.get("childFrames", []))
+
+    for cookie in driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", []):
+        domain = cookie.get("domain", "").lstrip(".")
+        if domain:
+            origins.update((f"https://{domain}", f"http://{domain}"))
+
+    origins.discard(None)
+    return origins
+
+
+class DriverPool:
+    """
+    bounded pool of pre-launched drivers.
+
+    at most `size` drivers exist at once. a driver is reset (cookies, http cache,
+    storage of every origin it visited, blank page) before going back to the
+    idle queue, and quit instead once it has served `max_pages` checkouts or
+    its process tree exceeds `max_rss_mb`.
+    with `admission`, every checkout first reserves memory for a launch or a
+    page load and fails with OverBudget when there is no headroom.
+    """
+
+    def __init__(self, factory, size=2, max_pages=50, max_rss_mb=450,
+                 checkout_timeout=60, on_checkout=None, admission=None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.checkout_timeout = checkout_timeout
+        self.on_checkout = on_checkout
+        self.admission = admission
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._live = 0
+        self._closed = False
+        self._stats = {"launched": 0, "reused": 0, "recycled": 0, "unhealthy": 0}
+
+    # lifecycle
+
+    def warm_up(self, count=1):
+        """launch up to `count` drivers in the background so the first requests skip the cold start"""
+        count = min(count, self.size)
+        if count <= 0:
+            return
+
+        def _warm():
+            for _ in range(count):
+                if not self._slots.acquire(blocking=False):
+                    return
+                try:
+                    if self.admission:
+                        self.admission.admit(self.admission.launch_mb, max_wait=0)
+                    entry = self._launch()
+                    self._idle.put(entry)
+                except Exception as e:
+                    logger.warning(f"driver warm-up failed: {e}")
+                finally:
+                    self._slots.release()
+
+        threading.Thread(target=_warm, name="driver-warmup", daemon=True).start()
+
+    def shutdown(self):
+        self._closed = True
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(entry)
+
+    # checkout
+
+    @contextmanager
+    def checkout(self):
+        """yield a ready driver; always returns it to the pool (or recycles it) afterwards"""
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolExhausted(self.checkout_timeout)
+
+        entry = None
+        try:
+            if self.admission:
+                # an idle driver only needs room for the page; otherwise chrome has to launch
+                cost = self.admission.page_mb if self._idle.qsize() else self.admission.launch_mb
+                metrics.record_stage("admission_wait", self.admission.admit(cost))
+            entry = self._acquire_entry()
+            if self.on_checkout:
+                try:
+                    self.on_checkout(entry.driver)
+                except Exception as e:
+                    logger.warning(f"driver checkout hook failed: {e}")
+            yield entry.driver
+        finally:
+            try:
+                if entry is not None:
+                    entry.pages += 1
+                    self._release_entry(entry)
+            finally:
+                self._slots.release()
+
+    def _acquire_entry(self):
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                return self._launch()
+
+            if self._healthy(entry.driver):
+                with self._lock:
+                    self._stats["reused"] += 1
+                return entry
+
+            with self._lock:
+                self._stats["unhealthy"] += 1
+            self._quit(entry)
+
+    def _release_entry(self, entry):
+        if self._closed:
+            self._quit(entry)
+            return
+
+        reason = self._recycle_reason(entry)
+        if reason:
+            logger.info(f"recycling driver ({reason})")
+            with self._lock:
+                self._stats["recycled"] += 1
+            self._quit(entry)
+            return
+
+        try:
+            self._reset(entry.driver)
+        except Exception as e:
+            logger.warning(f"driver reset failed, discarding: {e}")
+            self._quit(entry)
+            return
+
+        self._idle.put(entry)
+
+    # helpers
+
+    def _launch(self):
+        started = time.time()
+        driver = self.factory()
+        with self._lock:
+            self._live += 1
+            self._stats["launched"] += 1
+        logger.info(f"launched pooled driver in {time.time() - started:.1f}s")
+        return _Entry(driver)
+
+    def _quit(self, entry):
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._live -= 1
+
+    def _healthy(self, driver):
+        try:
+            driver.current_url
+            return bool(driver.window_handles)
+        except Exception:
+            return False
+
+    def _recycle_reason(self, entry):
+        if self.max_pages and entry.pages >= self.max_pages:
+            return f"served {entry.pages} pages"
+        if not self._healthy(entry.driver):
+            return "unhealthy"
+        if self.max_rss_mb:
+            rss = driver_rss_mb(entry.driver)
+            if rss is not None and rss > self.max_rss_mb:
+                return f"rss {rss:.0f}MB > {self.max_rss_mb}MB"
+        return None
+
+    def _reset(self, driver):
+        """wipe cookies, the http cache and site storage of every origin this checkout touched, then park the tab on a blank page"""
+        try:
+            origins = visited_origins(driver)
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            for origin in origins:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        except Exception:
+            # non-chromium fallback: only the current origin can be cleared
+            driver.delete_all_cookies()
+            if _origin(driver.current_url):
+                driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+
+        driver.get("about:blank")
+        try:
+            # the next checkout's visited_origins starts from here
+            driver.execute_cdp_cmd("Page.resetNavigationHistory", {})
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "live": self._live,
+                "idle": self._idle.qsize(),
+                **self._stats,
+            }
+
+
+def pool_from_env(factory, on_checkout=None, admission=None):
+    """build the shared pool from DRIVER_POOL_* env vars"""
+    pool = DriverPool(
+        factory,
+        size=int(os.environ.get("DRIVER_POOL_SIZE", 2)),
+        max_pages=int(os.environ.get("DRIVER_MAX_PAGES", 50)),
+        max_rss_mb=int(os.environ.get("DRIVER_MAX_RSS_MB", 450)),
+        checkout_timeout=float(os.environ.get("DRIVER_CHECKOUT_TIMEOUT", 60)),
+        on_checkout=on_checkout,
+        admission=admission,
+    )
+    atexit.register(pool.shutdown)
+    return pool
@@ -0,0 +1,143 @@
+"""
+html -> clean text extraction for /scrape.
+
+same output as the original BeautifulSoup path (non-empty stripped text nodes
+joined by newlines, script/style/svg/nav/footer/iframe/noscript removed) but
+with pluggable backends. the lxml backend drops unwanted tags while walking
+the tree once and stops as soon as the output budget is filled.
+
+SCRAPE_EXTRACT_ENGINE picks the backend: auto (default), selectolax, lxml or bs4.
+"""
+import logging
+import os
+import re
+from importlib.util import find_spec
+
+logger = logging.getLogger("scraper")
+
+STRIP_TAGS = ("script", "style", "svg", "nav", "footer", "iframe", "noscript")
+
+_BODY_RE = re.compile(r"<body[\s>]", re.IGNORECASE)
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+
+def lxml_document(html):
+    """
+    lxml.html document for a page's decoded text. lxml refuses str input that
+    starts with an <?xml encoding=...?> declaration (xhtml pages), so it gets
+    utf-8 bytes with the encoding spelled out instead.
+    """
+    import lxml.html
+
+    return lxml.html.document_fromstring(html.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8"))
+
+
+def extract_bs4(html, budget):
+    """reference implementation (the original pure-python path)"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(list(STRIP_TAGS)):
+        tag.decompose()
+    text = soup.body.get_text(separator="\n", strip=True) if soup.body else ""
+    return text[:budget]
+
+
+def _join_within(chunks, budget):
+    """stripped, non-empty chunks joined by newlines (bs4's get_text), stopping once `budget` chars are in"""
+    parts = []
+    size = 0
+    for chunk in chunks:
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        parts.append(chunk)
+        size += len(chunk) + 1
+        # joined length is size - 1 (no separator after the last chunk)
+        if size - 1 >= budget:
+            break
+    return "\n".join(parts)[:budget]
+
+
+def _iter_lxml_text(root):
+    """text nodes of `root` in document order, skipping stripped subtrees and comments"""
+    strip = set(STRIP_TAGS)
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            yield item
+            continue
+
+        # an element's tail belongs to its parent, so it survives even when the element is stripped
+        if item is not root and item.tail:
+            stack.append(item.tail)
+
+        tag = item.tag
+        if not isinstance(tag, str) or tag in strip:
+            continue
+
+        if item.text:
+            yield item.text
+        stack.extend(reversed(item))
+
+
+def extract_lxml(html, budget):
+    # match the bs4 path: no <body> tag, no text (lxml would invent one)
+    if not html or not _BODY_RE.search(html):
+        return ""
+
+    doc = lxml_document(html)
+    body = doc.body if doc.tag == "html" else doc.find(".//body")
+    if body is None:
+        return ""
+
+    return _join_within(_iter_lxml_text(body), budget)
+
+
+def extract_selectolax(html, budget):
+    # same rules as lxml: no <body> tag, no text
+    if not html or not _BODY_RE.search(html):
+        return ""
+
+    tree = LexborHTMLParser(html)
+    if tree.body is None:
+        return ""
+    tree.strip_tags(list(STRIP_TAGS))
+    chunks = (node.text_content for node in tree.body.traverse(include_text=True) if node.tag == "-text")
+    return _join_within(chunks, budget)
+
+
+ENGINES = {"bs4": extract_bs4}
+# lxml is only looked up here; it's imported by the first extraction that uses it
+if find_spec("lxml") is not None:
+    ENGINES["lxml"] = extract_lxml
+if LexborHTMLParser is not None:
+    ENGINES["selectolax"] = extract_selectolax
+
+
+def default_engine():
+    engine = os.environ.get("SCRAPE_EXTRACT_ENGINE", "auto")
+    if engine in ENGINES:
+        return engine
+    if engine != "auto":
+        logger.warning(f"extract engine {engine} unavailable, picking automatically")
+    for candidate in ("selectolax", "lxml", "bs4"):
+        if candidate in ENGINES:
+            return candidate
+
+
+def extract_text(html, budget=20000, engine=None):
+    """clean visible text of a page, at most `budget` chars"""
+    engine = engine or default_engine()
+    try:
+        return ENGINES[engine](html, budget)
+    except Exception as e:
+        if engine == "bs4":
+            raise
+        logger.warning(f"{engine} extraction failed, falling back to bs4: {e}")
+        return extract_bs4(html, budget)
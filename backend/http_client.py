@@ -0,0 +1,61 @@
+"""
+shared connection-pooled http session for the browserless fast paths.
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """lazily build one pooled session shared by every thread"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                pool_size = int(os.environ.get("HTTP_POOL_SIZE", 32))
+                adapter = HTTPAdapter(
+                    pool_connections=pool_size,
+                    pool_maxsize=pool_size,
+                    max_retries=Retry(total=1, connect=1, read=0, backoff_factor=0.3, allowed_methods=["GET", "HEAD"]),
+                )
+                session = requests.Session()
+                session.headers.update(DEFAULT_HEADERS)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def fetch_text(url, timeout=10, max_bytes=512 * 1024, headers=None):
+    """
+    GET a url and read at most `max_bytes` of its body.
+    returns (response, text); the response is closed, text is decoded leniently.
+    """
+    resp = get_session().get(url, timeout=timeout, allow_redirects=True, stream=True, headers=headers)
+    try:
+        chunks = []
+        size = 0
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                break
+        raw = b"".join(chunks)[:max_bytes]
+    finally:
+        resp.close()
+    # requests assumes latin-1 for text/* without a charset; most pages are utf-8
+    content_type = resp.headers.get("Content-Type", "").lower()
+    encoding = resp.encoding if "charset" in content_type and resp.encoding else "utf-8"
+    return resp, raw.decode(encoding, errors="replace")
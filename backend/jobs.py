@@ -0,0 +1,206 @@
+"""
+background job queue for long-running work (scrapes can take 60s+).
+
+jobs run on their own bounded pool of worker threads, so a burst of slow
+scrapes no longer ties up the http server's threads. clients submit, get an
+id back immediately and poll or stream the job's status. finished jobs are
+kept for `retention` seconds.
+"""
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger("scraper")
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class QueueFull(Exception):
+    """too many jobs waiting; callers should retry later"""
+
+
+class JobCancelled(Exception):
+    """raised by job functions that notice their cancel event mid-run"""
+
+
+class Job:
+    def __init__(self, kind, fn, params, priority):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.fn = fn
+        self.params = params
+        self.priority = priority
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        # set when the job failed on a full browser pool, throttling or memory; resubmit after it
+        self.retry_after = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        # bumped on every status change so streams can wait for "something new"
+        self.version = 0
+
+    def to_dict(self, include_result=True):
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": self.priority,
+            "params": self.params,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.started:
+            data["queue_wait_s"] = round(self.started - self.created, 3)
+        if self.finished and self.started:
+            data["run_s"] = round(self.finished - self.started, 3)
+        if self.error:
+            data["error"] = self.error
+        if self.retry_after is not None:
+            data["retry_after"] = int(self.retry_after) + 1
+        if include_result and self.status == SUCCEEDED:
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """priority heap + fixed worker threads; finished jobs are swept lazily after `retention`"""
+
+    def __init__(self, workers=2, max_queued=100, retention=900):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.retention = retention
+
+        self._jobs = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._started = False
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+
+    def submit(self, kind, fn, params=None, priority="normal"):
+        """
+        queue `fn(cancel_event)` and return its Job right away.
+        raises QueueFull when max_queued jobs are already waiting.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority} (known: {', '.join(PRIORITIES)})")
+
+        job = Job(kind, fn, params or {}, priority)
+        with self._cond:
+            self._sweep()
+            waiting = sum(1 for j in self._jobs.values() if j.status == QUEUED)
+            if waiting >= self.max_queued:
+                raise QueueFull(f"{waiting} jobs already queued")
+            self._ensure_started()
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (PRIORITIES[priority], next(self._seq), job))
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            self._sweep()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """queued jobs are dropped now; running ones are asked to stop at their next checkpoint"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in TERMINAL:
+                return job
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED)
+            return job
+
+    def wait_for_change(self, job, version, timeout):
+        """block until job.version moves past `version` or timeout; returns the new version"""
+        with self._cond:
+            self._cond.wait_for(lambda: job.version != version, timeout=timeout)
+            return job.version
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job = heapq.heappop(self._heap)
+                if job.status != QUEUED:
+                    continue  # cancelled while waiting
+                job.status = RUNNING
+                job.started = time.time()
+                self._bump(job)
+
+            try:
+                result = job.fn(job.cancel_event)
+                status, error = (CANCELLED, None) if job.cancel_event.is_set() else (SUCCEEDED, None)
+            except JobCancelled:
+                result, status, error = None, CANCELLED, None
+            except Exception as e:
+                if job.cancel_event.is_set():
+                    # stopping mid-navigation usually surfaces as a driver error
+                    result, status, error = None, CANCELLED, None
+                else:
+                    logger.error(f"job {job.id} ({job.kind}) failed: {e}")
+                    result, status, error = None, FAILED, str(e)
+                    job.retry_after = getattr(e, "retry_after", None)
+
+            with self._cond:
+                job.result = result
+                job.error = error
+                self._finish(job, status)
+
+    def _finish(self, job, status):
+        # caller holds self._cond
+        job.status = status
+        job.finished = time.time()
+        self._bump(job)
+
+    def _bump(self, job):
+        job.version += 1
+        self._cond.notify_all()
+
+    def _sweep(self):
+        # caller holds self._cond
+        cutoff = time.time() - self.retention
+        expired = [jid for jid, j in self._jobs.items() if j.status in TERMINAL and j.finished < cutoff]
+        for jid in expired:
+            del self._jobs[jid]
+
+    def stats(self):
+        with self._cond:
+            self._sweep()
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"workers": self.workers, "max_queued": self.max_queued, **counts}
+
+
+def queue_from_env():
+    """build the shared queue from JOB_* env vars"""
+    return JobQueue(
+        workers=int(os.environ.get("JOB_WORKERS", 2)),
+        max_queued=int(os.environ.get("JOB_MAX_QUEUED", 100)),
+        retention=int(os.environ.get("JOB_RETENTION_SECONDS", 900)),
+    )
@@ -1,17 +1,33 @@
-from flask import Flask, request, jsonify
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import undetected_chromedriver as uc
-from fake_useragent import UserAgent
-from bs4 import BeautifulSoup
+from flask import Flask, Response, request, jsonify, stream_with_context
+# selenium and undetected_chromedriver are imported on first use; most requests never start chrome
+import bootstrap
+from bootstrap import random_user_agent, random_window_size
+from driver_pool import pool_from_env
+from admission import admission_from_env
+from verifier import verify_url, verify_many, tier_stats
+from transcript_cache import cache_from_env, NEGATIVE
+from resource_blocking import blocking, patterns_for, default_profile as default_block_profile
+from scraper import scrape_page, parse_targets, BOT_TRIGGERS, LOAD_QUIET_MS
+from page_wait import wait_for_quiet
+from market import NoStructuredData, market_http, market_browser, display_price
+from scheduler import Throttled, scheduler_from_env
+from singleflight import flight_from_env, normalize_url
+from scrape_cache import STALE, scrape_cache_from_env
+from reddit_search import DDG_HTML_URL, SearchBlocked, SearchFailed, normalize_query, search_http
+import cooperative
+import metrics
+import video_frames
+from video_frames import extract_frames, default_mode as default_frame_mode, selection_from as frame_selection_from
+from jobs import QueueFull, TERMINAL as TERMINAL_JOB_STATES, queue_from_env
+from captions import fetch_transcript_ytdlp
+from transcript_workers import TranscriptError, pool_from_env as transcript_pool_from_env
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import atexit
 import logging
-import subprocess
-import sys
 import json
+import threading
 import time
-import random
 import os
 
 # configure logging
@@ -19,47 +35,158 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("scraper")
 
 app = Flask(__name__)
+metrics.init_app(app)
 
 def get_driver():
     """setup stealth chrome driver"""
+    with metrics.stage("driver_launch"):
+        return _launch_driver()
+
+def _launch_driver():
+    import undetected_chromedriver as uc
+
     options = uc.ChromeOptions()
     options.add_argument("--headless") 
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--disable-gpu")
+    # network events for resource blocking reports
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
     
     # random user agent
-    try:
-        ua = UserAgent()
-        user_agent = ua.random
+    user_agent = random_user_agent()
+    if user_agent:
         options.add_argument(f"user-agent={user_agent}")
-    except Exception as e:
-        logger.warning(f"UserAgent rotation failed: {e}")
 
     # stealth arguments
     options.add_argument("--disable-blink-features=AutomationControlled")
     # random window size
-    width = random.randint(1024, 1920)
-    height = random.randint(768, 1080)
+    width, height = random_window_size()
     options.add_argument(f"--window-size={width},{height}")
     
+    # patched once per chrome version and reused, instead of re-downloaded per launch
+    driver_path = bootstrap.patched_driver_path()
     try:
         # use_subprocess=True is often needed for uc in docker/flask envs
-        driver = uc.Chrome(options=options, use_subprocess=True, version_main=None) 
+        driver = uc.Chrome(options=options, use_subprocess=True, version_main=bootstrap.chrome_major(),
+                           driver_executable_path=driver_path)
+        metrics.DRIVER_LAUNCHES.inc(kind="uc")
         return driver
     except Exception as e:
         logger.error(f"failed to init undetected_chromedriver: {e}")
+        metrics.DRIVER_FALLBACKS.inc()
+        if driver_path and "session not created" in str(e).lower():
+            # chrome was likely updated; rebuild the driver for the new version next time
+            bootstrap.forget_patched_driver()
         # Fallback to standard selenium if uc fails specific env compat
+        from selenium import webdriver
         from selenium.webdriver.chrome.options import Options
         from selenium.webdriver.chrome.service import Service
-        from webdriver_manager.chrome import ChromeDriverManager
         
         logger.warning("Falling back to standard Selenium...")
         chrome_options = Options()
         chrome_options.add_argument("--headless")
         chrome_options.add_argument("--no-sandbox")
-        service = Service(ChromeDriverManager().install())
-        return webdriver.Chrome(service=service, options=chrome_options)
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        service = Service(bootstrap.fallback_driver_path())
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+        metrics.DRIVER_LAUNCHES.inc(kind="selenium")
+        return driver
+
+def randomize_fingerprint(driver):
+    """re-roll ua and window size on every checkout so pooled drivers don't share a fingerprint"""
+    user_agent = random_user_agent()
+    if user_agent:
+        driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent})
+    driver.set_window_size(*random_window_size())
+
+# memory budget every driver checkout must fit (rss of us + chrome + workers)
+admission = admission_from_env()
+
+# shared warm pool; routes check drivers out instead of launching chrome per request
+driver_pool = pool_from_env(get_driver, on_checkout=randomize_fingerprint, admission=admission)
+
+# per-domain rate limits and bot-check backoff for everything that drives a browser
+scheduler = scheduler_from_env()
+
+@contextmanager
+def browser_session(url):
+    """
+    wait for a scheduler slot on url's domain, then check out a driver.
+    yields (driver, slot); the slot takes report_block() when a bot check fires.
+    """
+    with scheduler.slot(url) as slot:
+        metrics.record_stage("scheduler_wait", slot.waited)
+        started = time.perf_counter()
+        with driver_pool.checkout() as driver:
+            metrics.record_stage("driver_checkout", time.perf_counter() - started)
+            yield driver, slot
+
+def throttled_response(e):
+    response = jsonify({"error": str(e), "status": "throttled"})
+    response.headers["Retry-After"] = str(int(e.retry_after) + 1)
+    return response, 503
+
+# persistent transcript cache shared across restarts
+transcript_cache = cache_from_env()
+
+# warm youtube_transcript_api processes instead of one interpreter per request
+transcript_workers = transcript_pool_from_env()
+atexit.register(transcript_workers.shutdown)
+atexit.register(video_frames.shutdown)
+
+# identical concurrent requests share one fetch; finished results are reused for a few seconds
+scrape_flights = flight_from_env("scrape")
+verify_flights = flight_from_env("verify", default_ttl=60)
+transcript_flights = flight_from_env("transcript")
+reddit_flights = flight_from_env("reddit", default_ttl=1800)
+
+# compressed /scrape results, served stale while a background refresh runs
+scrape_cache = scrape_cache_from_env()
+
+# slow scrapes can run here instead of holding a server thread
+job_queue = queue_from_env()
+
+# an open /jobs/<id>/events stream pins a waitress thread (a greenlet under gevent),
+# so only a few run at once and each ends after a while; past that, clients poll
+JOB_STREAM_MAX = int(os.environ.get("JOB_STREAM_MAX", 200 if cooperative.active() else 2))
+JOB_STREAM_SECONDS = float(os.environ.get("JOB_STREAM_SECONDS", 120))
+JOB_STREAM_RETRY_MS = int(os.environ.get("JOB_STREAM_RETRY_MS", 10000))
+job_streams = threading.BoundedSemaphore(JOB_STREAM_MAX)
+
+# pool occupancy, read whenever /metrics is scraped
+def _browser_states():
+    s = driver_pool.stats()
+    return {"busy": s["live"] - s["idle"], "idle": s["idle"]}
+
+
+def _job_states():
+    return {k: v for k, v in job_queue.stats().items() if k not in ("workers", "max_queued")}
+
+
+def _memory_kinds():
+    s = admission.stats()
+    if not s["enabled"]:
+        return {}
+    return {k: s[f"{k}_mb"] for k in ("rss", "reserved", "budget", "headroom")}
+
+
+def _transcript_worker_states():
+    s = transcript_workers.stats()
+    return {"busy": s["busy"], "idle": s["idle"]}
+
+
+metrics.Gauge("skeptek_browsers", "pooled chrome instances by state", ("state",), fn=_browser_states)
+metrics.Gauge("skeptek_jobs", "background jobs by status", ("status",), fn=_job_states)
+metrics.Gauge("skeptek_job_workers", "background job worker threads", fn=lambda: job_queue.workers)
+metrics.Gauge("skeptek_memory_mb", "service rss (with child processes), pending reservations and headroom against the budget",
+              ("kind",), fn=_memory_kinds)
+metrics.Gauge("skeptek_transcript_workers", "transcript worker processes by state", ("state",), fn=_transcript_worker_states)
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """prometheus text format"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/health")
 def health_check():
@@ -67,117 +194,141 @@ def health_check():
     return jsonify({
         "status": "active", 
         "service": "Skeptek Scraper (Stealth Mode)",
-        "timestamp": time.time()
+        "timestamp": time.time(),
+        "drivers": driver_pool.stats(),
+        "memory": admission.stats(),
+        "verify_tiers": tier_stats(),
+        "transcript_cache": transcript_cache.stats(),
+        "transcript_workers": transcript_workers.stats(),
+        "jobs": job_queue.stats(),
+        "video_decode": video_frames.stats(),
+        "serving": cooperative.stats(),
+        "scheduler": scheduler.stats(),
+        "scrape_cache": scrape_cache.stats(),
+        "singleflight": {f.name: f.stats() for f in (scrape_flights, verify_flights, transcript_flights, reddit_flights)}
     })
 
-@app.route("/transcript", methods=['GET'])
-def get_transcript():
-    video_id = request.args.get('video_id')
-    if not video_id:
-        return jsonify({"error": "Missing video_id"}), 400
-        
+def resolve_transcript(video_id, lang='en'):
+    """
+    cache -> worker pool -> yt-dlp fallback for one video, coalesced per (video_id, lang).
+    returns the response body; failures carry "error" and a "details" reason.
+    """
+    result, _ = transcript_flights.do(f"{video_id}:{lang}", lambda: fetch_transcript(video_id, lang))
+    return result
+
+def fetch_transcript(video_id, lang='en'):
+    # attempt 0: local cache (no network)
+    cached = transcript_cache.get(video_id, lang)
+    if cached:
+        status, value = cached
+        metrics.TRANSCRIPT_OUTCOMES.inc(outcome="cache_" + status)
+        if status == NEGATIVE:
+            return {"video_id": video_id, "error": "All transcript methods failed.", "details": value or "No transcript available", "cache": "negative"}
+        return {"video_id": video_id, "transcript": value, "cache": "hit"}
+
+    failures = []
+    # only youtube's own "no transcript" answers get negative-cached; busy or
+    # crashed workers, timeouts and network errors say nothing about the video
+    definitive = True
+
     # attempt 1: standard youtube_transcript_api (fastest)
     try:
-        # subprocess isolation to bypass import corruption
-        logger.info(f"fetching transcript for {video_id} via subprocess...")
-        
-        process = subprocess.Popen(
-            [sys.executable, "-m", "youtube_transcript_api", video_id, "--format", "json"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE, 
-            text=True
-        )
-        stdout, stderr = process.communicate()
-        
-        if process.returncode == 0 and stdout:
-             try:
-                start_idx = stdout.find('[')
-                end_idx = stdout.rfind(']')
-                if start_idx != -1 and end_idx != -1:
-                    clean_json = stdout[start_idx : end_idx + 1]
-                    transcript = json.loads(clean_json)
-                    return jsonify({"video_id": video_id, "transcript": transcript})
-             except:
-                 pass # fallback to yt-dlp below
-
-        logger.warning(f"primary transcript method failed: {stderr[:200]}")
-
+        # runs in a warm worker process, isolated from import corruption
+        logger.info(f"fetching transcript for {video_id} via worker pool...")
+        with metrics.stage("transcript_primary"):
+            transcript = transcript_workers.fetch(video_id, [lang])
+        if transcript:
+            metrics.TRANSCRIPT_OUTCOMES.inc(outcome="primary")
+            transcript_cache.put(video_id, lang, transcript)
+            return {"video_id": video_id, "transcript": transcript, "cache": "miss"}
+        failures.append("primary: empty transcript")
+
+    except TranscriptError as e:
+        logger.warning(f"primary transcript method failed: {str(e)[:200]}")
+        failures.append(f"primary: {str(e)[:200]}")
+        definitive = e.definitive
     except Exception as e:
         logger.error(f"primary method exception: {e}")
+        failures.append(f"primary: {e}")
+        definitive = False
 
     # attempt 2: yt-dlp fallback (robust against ip blocks)
     try:
         logger.info(f"attempting yt-dlp fallback for {video_id}...")
-        transcript = fetch_transcript_ytdlp(video_id)
+        with metrics.stage("transcript_ytdlp"):
+            transcript = fetch_transcript_ytdlp(video_id, lang)
         if transcript:
+             metrics.TRANSCRIPT_OUTCOMES.inc(outcome="ytdlp")
              logger.info(f"yt-dlp fallback success for {video_id}")
-             return jsonify({"video_id": video_id, "transcript": transcript})
+             transcript_cache.put(video_id, lang, transcript)
+             return {"video_id": video_id, "transcript": transcript, "cache": "miss"}
+        failures.append("yt-dlp: no captions")
     except Exception as e:
         logger.error(f"yt-dlp fallback failed: {e}")
+        failures.append(f"yt-dlp: {e}")
+        definitive = False
+
+    details = "; ".join(failures)
+    metrics.TRANSCRIPT_OUTCOMES.inc(outcome="failed")
+    if definitive:
+        # youtube has nothing for this video; don't ask again for a while
+        transcript_cache.put_negative(video_id, lang, details)
+    return {"video_id": video_id, "error": "All transcript methods failed.", "details": details, "cache": "miss"}
 
-    return jsonify({"error": "All transcript methods failed.", "details": "IP Blocked"}), 404
+@app.route("/transcript", methods=['GET'])
+def get_transcript():
+    video_id = request.args.get('video_id')
+    lang = request.args.get('lang', 'en')
+    if not video_id:
+        return jsonify({"error": "Missing video_id"}), 400
 
-def fetch_transcript_ytdlp(video_id):
+    result = resolve_transcript(video_id, lang)
+    if "error" in result:
+        return jsonify({"error": result["error"], "details": result["details"], "cache": result["cache"]}), 404
+    return jsonify(result)
+
+@app.route("/transcripts", methods=['POST'])
+def get_transcripts():
     """
-    fallback using yt-dlp to extract automatic captions
+    fetches transcripts for many videos concurrently.
+    body: {"video_ids": [...], "lang": "en"}; every id gets its own result or error.
     """
-    import yt_dlp
-    import requests
-    
-    url = f"https://www.youtube.com/watch?v={video_id}"
-    ydl_opts = {
-        'skip_download': True,
-        'writesubtitles': True,
-        'writeautomaticsub': True,
-        'subtitleslangs': ['en'],
-        'quiet': True,
-        'no_warnings': True,
-    }
-    
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            # 1. check automatic captions (most common)
-            captions = info.get('automatic_captions', {}).get('en', [])
-            # 2. check manual subtitles
-            if not captions:
-                captions = info.get('subtitles', {}).get('en', [])
-            
-            if not captions:
-                return None
-                
-            # prefer json3 format for easy parsing
-            json3_cap = next((c for c in captions if c.get('ext') == 'json3'), None)
-            
-            if json3_cap:
-                res = requests.get(json3_cap['url'])
-                if res.ok:
-                    data = res.json()
-                    transcript = []
-                    # parse json3 events
-                    if 'events' in data:
-                        for event in data['events']:
-                            if 'segs' in event and event['segs']:
-                                text = " ".join([s.get('utf8', '') for s in event['segs']]).strip()
-                                if text:
-                                    transcript.append({
-                                        'text': text,
-                                        'start': event.get('tStartMs', 0) / 1000.0,
-                                        'duration': event.get('dDurationMs', 0) / 1000.0
-                                    })
-                    return transcript
-                    
-            return None
-            
-    except Exception as e:
-        logger.error(f"yt-dlp internal error: {e}")
-        return None
+    data = request.json or {}
+    video_ids = data.get('video_ids')
+    lang = data.get('lang', 'en')
+
+    if not isinstance(video_ids, list) or not video_ids:
+        return jsonify({"error": "Missing video_ids list"}), 400
+    if not all(isinstance(v, str) and v.strip() for v in video_ids):
+        return jsonify({"error": "video_ids must be non-empty strings"}), 400
+
+    max_ids = int(os.environ.get("TRANSCRIPTS_BATCH_MAX_IDS", 20))
+    unique_ids = list(dict.fromkeys(v.strip() for v in video_ids))
+    if len(unique_ids) > max_ids:
+        return jsonify({"error": f"Too many video_ids (max {max_ids})"}), 400
+
+    def _resolve(video_id):
+        try:
+            return resolve_transcript(video_id, lang)
+        except Exception as e:
+            logger.error(f"batch transcript failed for {video_id}: {e}")
+            return {"video_id": video_id, "error": "Internal error", "details": str(e)}
+
+    concurrency = int(os.environ.get("TRANSCRIPTS_BATCH_CONCURRENCY", 4))
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(unique_ids)))) as executor:
+        results = list(executor.map(_resolve, unique_ids))
+
+    return jsonify({
+        "lang": lang,
+        "results": results,
+        "found": sum(1 for r in results if "transcript" in r),
+        "failed": sum(1 for r in results if "error" in r)
+    })
 
 @app.route("/verify", methods=['POST'])
 def verify_link():
     """
-    verifies if a link is alive using stealth driver.
+    verifies if a link is alive: pooled http check first, stealth driver only when needed.
     """
     data = request.json
     url = data.get('url') if data else None
@@ -185,54 +336,49 @@ def verify_link():
     if not url:
         return jsonify({"error": "Missing URL"}), 400
 
-    driver = None
+    return jsonify(coalesced_verify(url))
+
+def coalesced_verify(url):
+    """verify_url, shared between identical in-flight checks; driver warnings are never reused"""
+    result, _ = verify_flights.do(
+        normalize_url(url),
+        lambda: verify_url(url, browser_session),
+        cacheable=lambda r: "warning" not in r
+    )
+    return result
+
+@app.route("/verify/batch", methods=['POST'])
+def verify_batch():
+    """
+    verifies many links at once, streaming one ndjson line per url as it finishes.
+    body: {"urls": [...], "concurrency": 8, "per_domain": 2}
+    """
+    data = request.json or {}
+    urls = data.get('urls')
+
+    if not isinstance(urls, list) or not urls:
+        return jsonify({"error": "Missing urls list"}), 400
+    if not all(isinstance(u, str) and u.strip() for u in urls):
+        return jsonify({"error": "urls must be non-empty strings"}), 400
+
+    max_urls = int(os.environ.get("VERIFY_BATCH_MAX_URLS", 100))
+    if len(urls) > max_urls:
+        return jsonify({"error": f"Too many urls (max {max_urls})"}), 400
+
+    # callers may lower the caps but never raise them above the server limits
+    max_concurrency = int(os.environ.get("VERIFY_BATCH_CONCURRENCY", 8))
+    max_per_domain = int(os.environ.get("VERIFY_BATCH_PER_DOMAIN", 2))
     try:
-        driver = get_driver()
-        driver.set_page_load_timeout(30) 
-        
-        try:
-            driver.get(url)
-            time.sleep(random.uniform(2, 4)) # human pause
-            
-            # check title for "access denied" or "404"
-            title = driver.title.lower()
-            if "404" in title or "page not found" in title:
-                logger.info(f"link invalid (404 title): {url}")
-                return jsonify({"valid": False, "reason": "404 Title"})
-            
-            # redirect & nsfw detection
-            current_url = driver.current_url.lower()
-            if "reddit.com" in url.lower() and "reddit.com" not in current_url:
-                 return jsonify({"valid": False, "reason": "Redirected outside domain"})
-
-            # check for nsfw gates
-            body = ""
-            try:
-                body = driver.find_element(By.TAG_NAME, "body").text.strip().lower()
-            except:
-                pass
-
-            nsfw_triggers = ["over 18", "adult content", "nsfw", "click to enter", "mature content"]
-            if any(trigger in body for trigger in nsfw_triggers):
-                return jsonify({"valid": False, "reason": "NSFW/Restricted Content"})
-
-            if not body and "access denied" not in title:
-                return jsonify({"valid": False, "reason": "Empty Body"})
-                
-            return jsonify({"valid": True})
-
-        except Exception as nav_err:
-            logger.warning(f"navigation error for {url}: {nav_err}")
-            return jsonify({"valid": False, "reason": str(nav_err)})
-            
-    except Exception as e:
-        logger.error(f"verification driver error: {e}")
-        # Always return valid=True on driver crash to not block user, but log it
-        return jsonify({"valid": True, "warning": "Verification skipped due to driver error"}), 200
-    finally:
-        if driver:
-            try: driver.quit()
-            except: pass
+        concurrency = max(1, min(int(data.get('concurrency', max_concurrency)), max_concurrency))
+        per_domain = max(1, min(int(data.get('per_domain', max_per_domain)), max_per_domain))
+    except (TypeError, ValueError):
+        return jsonify({"error": "concurrency and per_domain must be integers"}), 400
+
+    def generate():
+        for result in verify_many(urls, coalesced_verify, concurrency, per_domain):
+            yield json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 @app.route("/scrape", methods=['GET'])
 def scrape_url():
@@ -244,83 +390,169 @@ def scrape_url():
     if not url:
         return jsonify({"error": "Missing URL parameter"}), 400
 
+    # optional early exit, e.g. ?targets=price,reviews,rating
+    # optional ?block=none|media|lean resource blocking profile
+    # optional ?fresh=1 skips the cache (the new result is still stored)
+    try:
+        targets = parse_targets(request.args.get('targets'))
+        block = request.args.get('block') or default_block_profile()
+        patterns_for(url, block)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    key = f"{normalize_url(url)}|{','.join(targets or [])}|{block}"
+    cached = None if request.args.get('fresh') in ('1', 'true') else scrape_cache.get(key)
+    if cached:
+        status, result, age = cached
+        if status == STALE:
+            refresh_scrape(key, url, targets, block)
+        with metrics.stage("serialize"):
+            return jsonify({**result, "cache": status, "cache_age_s": age})
+
     logger.info(f"stealth scrape: {url}")
-    driver = None
     try:
-        driver = get_driver()
-        driver.set_page_load_timeout(60) # increased timeout for heavy sites
-        
-        driver.get(url)
-        
-        # 1. Human-like Wait (randomized)
-        time.sleep(random.uniform(3, 6))
-        
-        # 2. Domain Specific Handling
-        current_url = driver.current_url.lower()
-        
-        if "lazada" in current_url:
-            # Try to close regional popup if exists
-            try:
-                close_btn = driver.find_element(By.XPATH, "//a[contains(@className, 'close')] | //button[contains(text(), 'X')]")
-                close_btn.click()
-                time.sleep(1)
-            except:
-                pass
-                
-        # 3. Human-like Scroll (Variable Speed)
-        # Shopee needs aggressive scrolling to trigger lazy load
-        total_height = int(driver.execute_script("return document.body.scrollHeight"))
-        current_pos = 0
-        
-        # Randomize scroll step size
-        scroll_step = random.randint(300, 700)
-        max_scroll = 15000 if "shopee" in current_url else 8000
-        
-        while current_pos < total_height:
-            current_pos += scroll_step
-            driver.execute_script(f"window.scrollTo(0, {current_pos});")
-            
-            # Variable pause to mimic reading
-            time.sleep(random.uniform(0.1, 0.4)) 
-            
-            # Update height in case of lazy loading
-            new_height = int(driver.execute_script("return document.body.scrollHeight"))
-            if new_height > total_height:
-                total_height = new_height
-                
-            if current_pos > max_scroll: break 
-            
-        time.sleep(2) # Settle after scrolling
-
-        # 4. Content Extraction
-        content = driver.page_source
-        soup = BeautifulSoup(content, "html.parser")
-        
-        # Clean
-        for script in soup(["script", "style", "svg", "nav", "footer", "iframe", "noscript"]):
-            script.decompose()
-            
-        clean_text = soup.body.get_text(separator="\n", strip=True) if soup.body else ""
-        
-        # Validation checks
-        bot_triggers = ["robot check", "captcha", "security challenge", "automated access"]
-        if len(clean_text) < 200 or any(t in clean_text.lower() for t in bot_triggers):
-             logger.warning(f"Scrape suspicious: length={len(clean_text)}, bot_triggered={any(t in clean_text.lower() for t in bot_triggers)}")
-             # We return what we have, but log warning.
-        
-        return jsonify({
-            "url": url,
-            "html": content[:500000], # Limit size to avoid payload errors
-            "text": clean_text[:20000] 
-        })
+        result = cached_scrape(key, url, targets, block)
+        with metrics.stage("serialize"):
+            return jsonify({**result, "cache": "miss"})
 
+    except Throttled as e:
+        return throttled_response(e)
     except Exception as e:
         logger.error(f"scrape failed: {e}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        if driver:
-            try: driver.quit()
-            except: pass
+
+def cached_scrape(key, url, targets, block):
+    """run_scrape shared between identical in-flight requests; clean results go to the cache"""
+    def _scrape_and_store():
+        result = run_scrape(url, targets, block)
+        if not result["bot_triggered"]:
+            scrape_cache.put(key, url, result)
+        return result
+
+    result, how = scrape_flights.do(key, _scrape_and_store)
+    if how != "leader":
+        logger.info(f"scrape {how}: {url}")
+    return result
+
+def refresh_scrape(key, url, targets, block):
+    """re-scrape a stale entry in the background at low priority (once per key)"""
+    if not scrape_cache.begin_refresh(key):
+        return
+
+    def _refresh(cancel_event):
+        try:
+            cached_scrape(key, url, targets, block)
+        finally:
+            scrape_cache.end_refresh(key)
+
+    try:
+        job_queue.submit("scrape-refresh", _refresh, params={"url": url, "targets": targets, "block": block}, priority="low")
+    except QueueFull:
+        scrape_cache.end_refresh(key)
+
+def run_scrape(url, targets=None, block=None, cancel_event=None):
+    """one pooled-driver scrape with resource blocking; shared by /scrape and scrape jobs"""
+    with browser_session(url) as (driver, slot):
+        with blocking(driver, url, block) as traffic:
+            result = scrape_page(driver, url, targets, cancel_event)
+        if result["bot_triggered"]:
+            slot.report_block()
+        else:
+            slot.report_ok()
+    result["blocking"] = traffic
+    return result
+
+@app.route("/jobs/scrape", methods=['POST'])
+def submit_scrape_job():
+    """
+    queues a scrape and returns its job id immediately.
+    body: {"url": ..., "targets": "price,reviews", "block": "lean", "priority": "high|normal|low"}
+    """
+    data = request.json or {}
+    url = data.get('url')
+    if not url:
+        return jsonify({"error": "Missing URL"}), 400
+
+    try:
+        targets = parse_targets(data.get('targets'))
+        block = data.get('block') or default_block_profile()
+        patterns_for(url, block)
+        job = job_queue.submit(
+            "scrape",
+            lambda cancel_event: run_scrape(url, targets, block, cancel_event),
+            params={"url": url, "targets": targets, "block": block},
+            priority=data.get('priority', 'normal')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFull as e:
+        response = jsonify({"error": "Job queue full", "details": str(e)})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+
+    return jsonify({
+        **job.to_dict(include_result=False),
+        "poll": f"/jobs/{job.id}",
+        "stream": f"/jobs/{job.id}/events"
+    }), 202
+
+@app.route("/jobs/<job_id>", methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs/<job_id>", methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job.to_dict(include_result=False))
+
+@app.route("/jobs/<job_id>/events", methods=['GET'])
+def stream_job(job_id):
+    """
+    server-sent events: one "status" event per change, ending with the final state.
+    at most JOB_STREAM_MAX streams are open at once and each closes after
+    JOB_STREAM_SECONDS with a "timeout" event; clients then poll /jobs/<id>
+    (or reconnect after the retry: hint). with the default SERVER_MODE=threads
+    every stream holds a server thread, so run SERVER_MODE=gevent for many watchers.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+
+    if not job_streams.acquire(blocking=False):
+        response = jsonify({"error": "Too many open job streams", "poll": f"/jobs/{job.id}"})
+        response.headers["Retry-After"] = str(JOB_STREAM_RETRY_MS // 1000)
+        return response, 503
+
+    def generate():
+        deadline = time.time() + JOB_STREAM_SECONDS
+        yield f"retry: {JOB_STREAM_RETRY_MS}\n\n"
+        version = None
+        while True:
+            if version != job.version:
+                version = job.version
+                done = job.status in TERMINAL_JOB_STATES
+                yield f"event: status\ndata: {json.dumps(job.to_dict(include_result=done))}\n\n"
+                if done:
+                    return
+            elif job.status not in TERMINAL_JOB_STATES:
+                yield ": keep-alive\n\n"
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                yield f"event: timeout\ndata: {json.dumps({'job_id': job.id, 'poll': f'/jobs/{job.id}'})}\n\n"
+                return
+            job_queue.wait_for_change(job, version, timeout=min(15, remaining))
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    # the server closes the response whether or not the stream ran to the end
+    response.call_on_close(job_streams.release)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 @app.route("/tools/market_deep_dive", methods=['POST'])
 def market_tool():
@@ -334,58 +566,64 @@ def market_tool():
     if not url:
         return jsonify({"error": "Missing URL"}), 400
 
-    driver = None
+    block = data.get('block') or default_block_profile()
     try:
-        driver = get_driver()
-        driver.set_page_load_timeout(45)
-        driver.get(url)
-        time.sleep(3)
-        
-        # fast price & title check
-        title = driver.title
-        price = "Unknown"
-        
-        price_selectors = ['.a-price-whole', '.a-offscreen', '.price-box', '.product-price', '.shopeep-price', '.pdp-price']
-        for sel in price_selectors:
-            try:
-                el = driver.find_element(By.CSS_SELECTOR, sel)
-                if el.text: 
-                    price = el.text
-                    break
-            except: continue
-        
-        # Fallback to page text search if selector fails
-        if price == "Unknown":
-             try:
-                 body = driver.find_element(By.TAG_NAME, "body").text
-                 # Very naive regex for currency
-                 import re
-                 prices = re.findall(r'[\$₱]\s?[\d,]+(\.\d{2})?', body)
-                 if prices:
-                     price = "Found in text" # We let AI parse the full text mostly, this is just a quick check
-             except: pass
+        patterns_for(url, block)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # tier 1: structured data over plain http, no browser
+    traffic = None
+    try:
+        with metrics.stage("market_http"):
+            found = market_http(url)
+        tier = "http"
+    except NoStructuredData as e:
+        logger.info(f"market fast path missed ({e}), loading {url[:80]} in chrome")
+        found = None
+    except Exception as e:
+        logger.error(f"market fast path failed ({e}), loading {url[:80]} in chrome")
+        found = None
+
+    try:
+        if found is None:
+            tier = "chrome"
+            with browser_session(url) as (driver, slot), blocking(driver, url, block) as traffic:
+                driver.set_page_load_timeout(45)
+                driver.get(url)
+                wait_for_quiet(driver, quiet_ms=LOAD_QUIET_MS, timeout=6)
+
+                with metrics.stage("market_browser"):
+                    found = market_browser(driver)
+                if any(t in found["title"].lower() for t in BOT_TRIGGERS):
+                    slot.report_block()
+                else:
+                    slot.report_ok()
 
         return jsonify({
             "tool_name": "market_deep_dive",
             "status": "success",
             "data": {
-                "title": title,
-                "price": price,
-                "url": url,
-                "is_available": True 
-            }
+                "title": found["title"],
+                "price": display_price(found["price"], found["currency"]),
+                "price_amount": found["price"],
+                "currency": found["currency"],
+                "is_available": found["availability"],
+                "source": found["source"],
+                "url": url
+            },
+            "tier": tier,
+            "blocking": traffic
         })
+    except Throttled as e:
+        return throttled_response(e)
     except Exception as e:
         return jsonify({"error": str(e), "status": "failed"}), 500
-    finally:
-        if driver:
-            try: driver.quit()
-            except: pass
 
 @app.route("/tools/video_insight", methods=['POST'])
 def video_tool():
     """
-    agentic tool endpoint: downloads youtube video, extracts frames, and uses gemini vision to find visual defects.
+    agentic tool endpoint: pulls key frames from a youtube video and uses gemini vision to find visual defects.
     """
     data = request.json
     video_url = data.get('url') if data else None
@@ -393,13 +631,15 @@ def video_tool():
     if not video_url:
         return jsonify({"error": "Missing URL"}), 400
 
-    import yt_dlp
+    # optional {"k": 3, "budget": 8, "selection": "smart"|"fixed", "mode": "stream"|"download"}
+    mode = data.get('mode') or default_frame_mode()
+    if mode not in ("stream", "download"):
+        return jsonify({"error": f"Unknown frame mode: {mode} (known: stream, download)"}), 400
     try:
-        import cv2
-    except ImportError:
-        cv2 = None
-        logger.warning("warning: opencv (cv2) not found. vision features disabled.")
-    import os
+        selection = frame_selection_from(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     import google.generativeai as genai
 
     # configure gemini inside the tool (using env var passed to backend or hardcoded for hackathon)
@@ -409,143 +649,221 @@ def video_tool():
         genai.configure(api_key=api_key)
     
     try:
-        # 1. download video (fastest format, worst quality sufficient for vision)
-        logger.info(f"downloading video: {video_url}")
-        
-        ydl_opts = {
-            'format': 'worst[ext=mp4]', # we just need visual context, not 4k
-            'outtmpl': 'temp_video.%(ext)s',
-            'quiet': True,
-            'no_warnings': True
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([video_url])
-            
-        # 2. extract 3 key frames (beginning, middle, end)
-        cap = cv2.VideoCapture("temp_video.mp4")
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        
-        frames = []
-        # grab at 10%, 50%, 80% marks
-        for percent in [0.1, 0.5, 0.8]:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * percent))
-            ret, frame = cap.read()
-            if ret:
-                # resize to save bandwidth (gemini only needs small imgs)
-                frame = cv2.resize(frame, (640, 360)) 
-                _, buffer = cv2.imencode('.jpg', frame)
-                frames.append({
-                    "mime_type": "image/jpeg",
-                    "data": buffer.tobytes()
-                })
-        
-        cap.release()
+        # 1+2. pull the k most informative frames straight from the stream
+        logger.info(f"extracting frames ({mode}): {video_url}")
+        with metrics.stage("video_frames"):
+            jpegs, frame_report = extract_frames(video_url, mode, selection)
+        frames = [{"mime_type": "image/jpeg", "data": jpeg} for jpeg in jpegs]
+        frame_report["frames"] = len(frames)
         
         # 3. analyze with gemini flash (fast vision)
         logger.info("sending frames to gemini vision...")
         if not api_key:
-             return jsonify({"status": "skipped", "reason": "No API Key configured on backend"}), 200
+             return jsonify({"status": "skipped", "reason": "No API Key configured on backend", "video": frame_report}), 200
 
         model = genai.GenerativeModel('gemini-3-flash-preview')
-        prompt = """
-        Analyze these 3 frames from a product review video.
+        prompt = f"""
+        Analyze these {len(frames)} frames from a product review video.
         1. Is the reviewer holding the product? (Yes/No)
         2. Does the product look broken, cheap, or fake?
         3. Is the reviewer making a disgusted or angry face?
         
         Return JSON Code Block:
         ```json
-        { "reviewerHoldingProduct": boolean, "visualDefects": string, "angryFaceDetected": boolean }
+        {{ "reviewerHoldingProduct": boolean, "visualDefects": string, "angryFaceDetected": boolean }}
         ```
         """
         
-        response = model.generate_content(
-            contents=[prompt, *frames],
-            generation_config={"response_mime_type": "application/json"}
-        )
+        with metrics.stage("gemini"):
+            response = model.generate_content(
+                contents=[prompt, *frames],
+                generation_config={"response_mime_type": "application/json"}
+            )
         
-        # cleanup
-        if os.path.exists("temp_video.mp4"):
-            os.remove("temp_video.mp4")
-            
         return jsonify({
             "tool_name": "video_insight",
             "status": "success",
-            "data": json.loads(response.text)
+            "data": json.loads(response.text),
+            "video": frame_report
         })
 
+    except Throttled as e:
+        return throttled_response(e)
     except Exception as e:
         logger.error(f"video tool error: {e}")
-        if os.path.exists("temp_video.mp4"):
-            try: os.remove("temp_video.mp4")
-            except: pass
         return jsonify({"error": str(e), "status": "failed"}), 500
 
+def _ddg_browser_links(driver, slot, search_url, limit):
+    from selenium.webdriver.common.by import By
+
+    links = []
+    driver.get(search_url)
+    time.sleep(2) # Wait for JS
+    if any(t in driver.title.lower() for t in BOT_TRIGGERS):
+        slot.report_block()
+
+    # extract results
+    results = driver.find_elements(By.CSS_SELECTOR, "a[data-testid='result-title-a']")
+
+    for res in results:
+        url = res.get_attribute("href")
+        title = res.text
+        if url and "reddit.com/r/" in url and "/comments/" in url:
+            links.append({"title": title, "url": url})
+
+        if len(links) >= limit: break
+    return links
+
+def _google_browser_links(driver, slot, google_url, limit):
+    from selenium.webdriver.common.by import By
+
+    links = []
+    driver.get(google_url)
+    time.sleep(2)
+    if "/sorry/" in driver.current_url or any(t in driver.title.lower() for t in BOT_TRIGGERS):
+        slot.report_block()
+    g_results = driver.find_elements(By.TAG_NAME, "a")
+    for res in g_results:
+        href = res.get_attribute("href")
+        if href and "reddit.com/r/" in href and "/comments/" in href:
+            # google redirect filtering often needed, but raw href works usually
+            links.append({"title": "Reddit Thread", "url": href})
+        if len(links) >= limit: break
+    return links
+
+def reddit_search_browser(query, limit=5):
+    """the old headless path: duckduckgo in chrome, then google if that finds nothing"""
+    # "site:reddit.com" is key
+    search_url = f"https://duckduckgo.com/?q=site%3Areddit.com+{query.replace(' ', '+')}&t=h_&ia=web"
+    google_url = f"https://www.google.com/search?q=site:reddit.com+{query.replace(' ', '+')}"
+
+    # ddg's backoff after a bot check covers its browser page too; don't wait it out
+    if scheduler.backoff_remaining(search_url) > 0:
+        logger.info("ddg is backing off after a bot check, searching google directly")
+        with browser_session(google_url) as (driver, slot):
+            return _google_browser_links(driver, slot, google_url, limit)
+
+    with browser_session(search_url) as (driver, slot):
+        links = _ddg_browser_links(driver, slot, search_url, limit)
+
+        # fallback to google if ddg fails (rare)
+        if not links:
+             logger.info("ddg yielded no results. trying google fallback...")
+             with scheduler.slot(google_url) as google_slot:
+                 links = _google_browser_links(driver, google_slot, google_url, limit)
+    return links
+
+def reddit_threads(query, limit=5):
+    """
+    http search first, browser only when it fails; cached and coalesced per normalized query.
+    returns (links, source, cache) where cache is miss, hit or coalesced.
+    """
+    def _search():
+        try:
+            with scheduler.slot(DDG_HTML_URL) as slot:
+                metrics.record_stage("scheduler_wait", slot.waited)
+                try:
+                    with metrics.stage("reddit_http"):
+                        return search_http(query, limit), "http"
+                except SearchBlocked:
+                    slot.report_block()
+                    raise
+        except SearchFailed as e:
+            logger.info(f"http reddit search failed ({e}), falling back to the browser")
+            with metrics.stage("reddit_browser"):
+                return reddit_search_browser(query, limit), "browser"
+
+    (links, source), how = reddit_flights.do(
+        f"{normalize_query(query)}|{limit}",
+        _search,
+        cacheable=lambda r: bool(r[0])
+    )
+    return links, source, {"leader": "miss", "cached": "hit"}.get(how, how)
+
 @app.route("/tools/reddit_search", methods=['POST'])
 def reddit_search_tool():
     """
-    agentic tool: performs a "headless manual search" for reddit threads.
-    this bypasses api limitations by acting as a human user.
+    agentic tool: finds reddit threads for a query.
+    duckduckgo's html endpoint over plain http; the headless browser only steps in when that fails.
     """
-    data = request.json
+    data = request.json or {}
     query = data.get('query')
     if not query:
         return jsonify({"error": "Missing query"}), 400
 
-    logger.info(f"reddit manual search for: {query}")
-    driver = None
-    links = []
-    
+    logger.info(f"reddit search for: {query}")
     try:
-        driver = get_driver()
-        # use duckduckgo to avoid google captchas in headless mode
-        # "site:reddit.com" is key
-        search_url = f"https://duckduckgo.com/?q=site%3Areddit.com+{query.replace(' ', '+')}&t=h_&ia=web"
-        
-        driver.get(search_url)
-        time.sleep(2) # Wait for JS
-        
-        # extract results
-        results = driver.find_elements(By.CSS_SELECTOR, "a[data-testid='result-title-a']")
-        
-        for res in results:
-            url = res.get_attribute("href")
-            title = res.text
-            if url and "reddit.com/r/" in url and "/comments/" in url:
-                links.append({"title": title, "url": url})
-                
-            if len(links) >= 5: break
-            
-        # fallback to google if ddg fails (rare)
-        if not links:
-             logger.info("ddg yielded no results. trying google fallback...")
-             driver.get(f"https://www.google.com/search?q=site:reddit.com+{query.replace(' ', '+')}")
-             time.sleep(2)
-             g_results = driver.find_elements(By.TAG_NAME, "a")
-             for res in g_results:
-                 href = res.get_attribute("href")
-                 if href and "reddit.com/r/" in href and "/comments/" in href:
-                     # google redirect filtering often needed, but raw href works usually
-                     links.append({"title": "Reddit Thread", "url": href})
-                 if len(links) >= 5: break
-        
+        links, source, how = reddit_threads(query)
         return jsonify({
             "tool_name": "reddit_search",
             "status": "success",
-            "data": links
+            "data": links,
+            "source": source,
+            "cache": how
         })
 
+    except Throttled as e:
+        return throttled_response(e)
     except Exception as e:
         logger.error(f"reddit search error: {e}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        if driver:
-            try: driver.quit()
-            except: pass
+
+@app.route("/tools/reddit_search/batch", methods=['POST'])
+def reddit_search_batch():
+    """
+    several query variants at once (reddit-scout tries a few per product).
+    body: {"queries": [...], "limit": 5}; "data" merges every query's threads, deduped by url.
+    """
+    data = request.json or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "Missing queries list"}), 400
+
+    max_queries = int(os.environ.get("REDDIT_BATCH_MAX_QUERIES", 10))
+    unique = list(dict.fromkeys(q for q in (str(q).strip() for q in queries) if q))
+    if not unique:
+        return jsonify({"error": "Missing queries list"}), 400
+    if len(unique) > max_queries:
+        return jsonify({"error": f"Too many queries (max {max_queries})"}), 400
+    try:
+        limit = max(1, min(int(data.get('limit', 5)), 25))
+    except (TypeError, ValueError):
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    def _search(query):
+        try:
+            links, source, how = reddit_threads(query, limit)
+            return {"query": query, "data": links, "source": source, "cache": how}
+        except Throttled as e:
+            return {"query": query, "error": str(e), "status": "throttled"}
+        except Exception as e:
+            logger.error(f"batch reddit search failed for {query}: {e}")
+            return {"query": query, "error": str(e)}
+
+    concurrency = int(os.environ.get("REDDIT_BATCH_CONCURRENCY", 4))
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(unique)))) as executor:
+        results = list(executor.map(_search, unique))
+
+    merged = {}
+    for result in results:
+        for link in result.get("data", []):
+            merged.setdefault(link["url"], link)
+
+    return jsonify({
+        "tool_name": "reddit_search",
+        "status": "success",
+        "data": list(merged.values()),
+        "results": results
+    })
+
+# interpreter start-up, imports and pool setup; the first request per route is logged by metrics
+startup_seconds = bootstrap.since_process_start()
+metrics.STARTUP_SECONDS.set(round(startup_seconds, 3))
+logger.info(f"app loaded {startup_seconds:.2f}s after process start")
 
 if __name__ == "__main__":
     # multi-threaded server by default in flask dev
     print("🚀 skeptek backend starting... (STEALTH MODE: /scrape, /transcript, /verify)")
+    driver_pool.warm_up(int(os.environ.get("DRIVER_POOL_WARM", 1)))
+    transcript_workers.warm_up(1)
     app.run(host="0.0.0.0", port=8000, threaded=True)
@@ -0,0 +1,271 @@
+"""
+price / currency / availability extraction for /tools/market_deep_dive.
+
+tier 1 fetches the page over the pooled http session and reads the structured
+data most shops embed for search engines: json-ld Product/Offer, opengraph
+product:* meta tags and schema.org microdata. only when that finds no price
+does tier 2 load the page in chrome, and then every selector, meta tag and
+json-ld block is read back in one execute_script call.
+"""
+import json
+import logging
+import re
+
+from cooperative import offload
+from extract import lxml_document
+from http_client import fetch_text
+
+logger = logging.getLogger("scraper")
+
+# css selectors tried in order when the page has no structured price
+PRICE_SELECTORS = [
+    ".a-price .a-offscreen", ".a-offscreen", ".a-price-whole", "#priceblock_ourprice",
+    ".pdp-price", ".product-price", ".shopeep-price", ".price-box", "[itemprop=price]",
+]
+AVAILABILITY_SELECTORS = ["#availability", ".stock", ".pdp-mod-stock", ".product-stock"]
+
+# schema.org ItemAvailability values (last path segment, lowercased)
+AVAILABLE = {"instock", "limitedavailability", "instoreonly", "onlineonly", "preorder", "presale", "backorder"}
+UNAVAILABLE = {"outofstock", "soldout", "discontinued"}
+
+OUT_OF_STOCK_PHRASES = ["out of stock", "sold out", "currently unavailable", "no longer available"]
+IN_STOCK_PHRASES = ["in stock", "add to cart", "buy now", "pieces available"]
+
+CURRENCY_SYMBOLS = {
+    "₱": "PHP", "php": "PHP", "$": "USD", "us$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY",
+    "₹": "INR", "rm": "MYR", "rp": "IDR", "฿": "THB", "₫": "VND", "s$": "SGD",
+}
+
+_PRICE_RE = re.compile(r"(US\$|S\$|PHP|RM|Rp|[\$₱€£¥₹฿₫])\s?(\d[\d,]*(?:\.\d{1,2})?)", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+class NoStructuredData(Exception):
+    """the http tier found no usable price; the browser tier should take over"""
+
+
+def parse_amount(value):
+    """"12,499.00" / 279.99 / "₱11,999" -> float, or None"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_RE.search(str(value or ""))
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def parse_price_text(text):
+    """first "₱12,499" style price in free text -> (amount, currency) or (None, None)"""
+    match = _PRICE_RE.search(text or "")
+    if not match:
+        return None, None
+    return parse_amount(match.group(2)), CURRENCY_SYMBOLS.get(match.group(1).lower())
+
+
+def parse_availability(value):
+    """schema.org url/name or page wording -> True, False or None when unknown"""
+    value = str(value or "").strip().lower()
+    if not value:
+        return None
+    token = value.rstrip("/").rsplit("/", 1)[-1].replace(" ", "")
+    if token in AVAILABLE:
+        return True
+    if token in UNAVAILABLE:
+        return False
+    if any(p in value for p in OUT_OF_STOCK_PHRASES):
+        return False
+    if any(p in value for p in IN_STOCK_PHRASES):
+        return True
+    return None
+
+
+def _types(node):
+    kind = node.get("@type")
+    return {str(t).lower() for t in (kind if isinstance(kind, list) else [kind]) if t}
+
+
+def _walk_jsonld(node):
+    """every dict in a json-ld document (handles @graph and top-level arrays)"""
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(reversed(item))
+        elif isinstance(item, dict):
+            yield item
+            for key in ("@graph", "mainEntity", "itemListElement"):
+                if key in item:
+                    stack.append(item[key])
+
+
+def from_jsonld(blocks):
+    """first Product with an offer price among json-ld script bodies"""
+    for raw in blocks:
+        try:
+            doc = json.loads(raw.strip().rstrip(";"))
+        except (ValueError, AttributeError):
+            continue
+        for node in _walk_jsonld(doc):
+            types = _types(node)
+            if "product" not in types and not types & {"offer", "aggregateoffer"}:
+                continue
+            offers = node.get("offers", node) if "product" in types else node
+            for offer in offers if isinstance(offers, list) else [offers]:
+                if not isinstance(offer, dict):
+                    continue
+                spec = offer.get("priceSpecification")
+                spec = spec[0] if isinstance(spec, list) and spec else spec
+                amount = parse_amount(
+                    offer.get("price") or offer.get("lowPrice") or (spec.get("price") if isinstance(spec, dict) else None)
+                )
+                if amount is None:
+                    continue
+                currency = offer.get("priceCurrency") or (spec.get("priceCurrency") if isinstance(spec, dict) else None)
+                return {
+                    "title": node.get("name") if "product" in types else None,
+                    "price": amount,
+                    "currency": currency,
+                    "availability": parse_availability(offer.get("availability")),
+                    "source": "json-ld",
+                }
+    return None
+
+
+def from_meta(meta):
+    """opengraph / product:* meta tags and microdata, flattened to {name: content}"""
+    amount = parse_amount(
+        meta.get("product:price:amount") or meta.get("og:price:amount") or meta.get("price")
+    )
+    if amount is None:
+        return None
+    return {
+        "title": meta.get("og:title") or meta.get("name"),
+        "price": amount,
+        "currency": meta.get("product:price:currency") or meta.get("og:price:currency") or meta.get("pricecurrency"),
+        "availability": parse_availability(
+            meta.get("product:availability") or meta.get("og:availability") or meta.get("availability")
+        ),
+        "source": "opengraph" if meta.get("product:price:amount") or meta.get("og:price:amount") else "microdata",
+    }
+
+
+def structured_data(blocks, meta):
+    """json-ld first, then meta/microdata; None when neither carries a price"""
+    return from_jsonld(blocks) or from_meta(meta)
+
+
+def parse_html(html):
+    """(json-ld script bodies, flattened meta + microdata, <title>) from raw html"""
+    doc = lxml_document(html)
+    blocks = [s.text or "" for s in doc.iter("script") if (s.get("type") or "").lower() == "application/ld+json"]
+
+    meta = {}
+    for el in doc.iter("meta"):
+        name = (el.get("property") or el.get("name") or el.get("itemprop") or "").lower()
+        if name and el.get("content") and name not in meta:
+            meta[name] = el.get("content")
+    for el in doc.xpath("//*[@itemprop]"):
+        name = el.get("itemprop").lower()
+        if name in meta:
+            continue
+        value = el.get("content") or el.get("href") or el.text_content().strip()
+        if value:
+            meta[name] = value
+
+    title = doc.findtext(".//title") or ""
+    return blocks, meta, title.strip()
+
+
+def market_http(url, timeout=10):
+    """tier 1: structured data from a plain GET; raises NoStructuredData when there's no price"""
+    try:
+        resp, html = fetch_text(url, timeout=timeout, max_bytes=2 * 1024 * 1024)
+    except Exception as e:
+        raise NoStructuredData(f"http error: {e.__class__.__name__}")
+    if resp.status_code >= 400:
+        raise NoStructuredData(f"status {resp.status_code}")
+    if not html.strip():
+        raise NoStructuredData("empty body")
+
+    try:
+        blocks, meta, title = offload(parse_html, html)
+    except Exception as e:
+        raise NoStructuredData(f"unparseable html: {e.__class__.__name__}")
+    found = structured_data(blocks, meta)
+    if not found:
+        raise NoStructuredData("no structured price")
+    found["title"] = title or found["title"]
+    return found
+
+
+# one round trip: selectors, meta/microdata, json-ld and a text sample
+_MARKET_JS = """
+const [priceSelectors, availabilitySelectors] = arguments;
+const firstText = (selectors) => {
+    for (const sel of selectors) {
+        try {
+            for (const el of document.querySelectorAll(sel)) {
+                const text = (el.getAttribute('content') || el.textContent || '').trim();
+                if (text) return text;
+            }
+        } catch (e) {}
+    }
+    return null;
+};
+const meta = {};
+for (const el of document.querySelectorAll('meta')) {
+    const name = (el.getAttribute('property') || el.getAttribute('name') || el.getAttribute('itemprop') || '').toLowerCase();
+    if (name && el.content && !(name in meta)) meta[name] = el.content;
+}
+for (const el of document.querySelectorAll('[itemprop]')) {
+    const name = el.getAttribute('itemprop').toLowerCase();
+    if (name in meta) continue;
+    const value = el.getAttribute('content') || el.getAttribute('href') || (el.textContent || '').trim();
+    if (value) meta[name] = value;
+}
+return {
+    title: document.title,
+    price_text: firstText(priceSelectors),
+    availability_text: firstText(availabilitySelectors),
+    jsonld: Array.from(document.querySelectorAll('script[type="application/ld+json"]')).map(s => s.textContent),
+    meta: meta,
+    body: document.body ? document.body.innerText.slice(0, 20000) : ''
+};
+"""
+
+
+def market_browser(driver):
+    """tier 2: read everything from the loaded page in a single script call"""
+    page = driver.execute_script(_MARKET_JS, PRICE_SELECTORS, AVAILABILITY_SELECTORS) or {}
+    body = page.get("body") or ""
+
+    found = structured_data(page.get("jsonld") or [], page.get("meta") or {})
+    if found:
+        found["source"] = "browser " + found["source"]
+    else:
+        amount, currency = parse_price_text(page.get("price_text"))
+        source = "browser selector"
+        if amount is None and page.get("price_text"):
+            amount = parse_amount(page.get("price_text"))
+        if amount is None:
+            amount, currency = parse_price_text(body)
+            source = "browser text"
+        found = {"price": amount, "currency": currency, "availability": None, "source": source if amount is not None else None}
+
+    if found["availability"] is None:
+        found["availability"] = parse_availability(page.get("availability_text"))
+    if found["availability"] is None:
+        found["availability"] = parse_availability(body[:5000])
+
+    found["title"] = page.get("title") or found.get("title") or ""
+    return found
+
+
+def display_price(amount, currency):
+    """kept for the frontend, which shows data.price as-is ("Unknown" when missing)"""
+    if amount is None:
+        return "Unknown"
+    return f"{currency} {amount:,.2f}" if currency else f"{amount:,.2f}"
@@ -0,0 +1,235 @@
+"""
+in-process metrics in the prometheus text format, plus Server-Timing headers.
+
+counters, gauges and histograms live in one registry and are rendered at
+/metrics. `stage(name)` times a block into the stage histogram and, inside a
+request, also into that response's Server-Timing header, so a slow /scrape
+shows whether the time went to the pool, navigation, scrolling, extraction or
+serialization.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("scraper")
+
+# seconds; browser work runs into the minutes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+# stage timings of the request being served: [(name, seconds), ...]
+_timings = contextvars.ContextVar("timings", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """set directly, or pass `fn` returning a number or {label value: number} read at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), fn=None):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                value = None
+            with self._lock:
+                if isinstance(value, dict):
+                    self._values = {(str(k),) if self.label_names else (): v for k, v in value.items()}
+                elif value is not None:
+                    self._values = {(): value}
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, {'le': _number(bound)})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, {'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+def render():
+    """every registered metric in the prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# shared metrics; modules record into these instead of defining their own
+
+REQUEST_SECONDS = Histogram("skeptek_request_seconds", "HTTP request latency by route", ("route", "method", "status"))
+REQUESTS_IN_FLIGHT = Gauge("skeptek_requests_in_flight", "HTTP requests being served")
+STAGE_SECONDS = Histogram("skeptek_stage_seconds", "latency of one stage of a request or job", ("stage",))
+DRIVER_LAUNCHES = Counter("skeptek_driver_launches_total", "chrome instances started, by driver kind", ("kind",))
+DRIVER_FALLBACKS = Counter("skeptek_driver_fallbacks_total", "undetected_chromedriver failures that fell back to plain selenium")
+TRANSCRIPT_OUTCOMES = Counter("skeptek_transcript_outcomes_total", "how transcript lookups were answered", ("outcome",))
+BOT_TRIGGERS = Counter("skeptek_bot_triggers_total", "bot checks seen while driving a site", ("domain",))
+STARTUP_SECONDS = Gauge("skeptek_startup_seconds", "process start until the app finished loading")
+ADMISSION_REJECTIONS = Counter("skeptek_admission_rejections_total", "browser work turned away by the memory budget")
+
+
+@contextmanager
+def stage(name):
+    """time a block into skeptek_stage_seconds and the current response's Server-Timing"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def record_stage(name, seconds):
+    """like stage() for a duration measured elsewhere"""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def server_timing(timings, total):
+    """Server-Timing header value; repeated stages are summed"""
+    merged = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in merged.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def init_app(app):
+    """per-route latency, in-flight gauge and Server-Timing on every response; each route's first request is logged"""
+    from flask import g, request
+
+    seen_routes = set()
+
+    @app.before_request
+    def _start_timer():
+        REQUESTS_IN_FLIGHT.inc()
+        g.metrics_started = time.perf_counter()
+        g.metrics_timings = []
+        g.metrics_token = _timings.set(g.metrics_timings)
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(total, route=route, method=request.method, status=response.status_code)
+        response.headers["Server-Timing"] = timing = server_timing(g.metrics_timings, total)
+        if (request.method, route) not in seen_routes:
+            # the first request pays for lazy imports and one-time setup
+            seen_routes.add((request.method, route))
+            logger.info(f"first {request.method} {route}: {total * 1000:.0f}ms ({timing})")
+        return response
+
+    @app.teardown_request
+    def _finish(exc):
+        token = g.pop("metrics_token", None)
+        if token is not None:
+            REQUESTS_IN_FLIGHT.dec()
+            _timings.reset(token)
@@ -0,0 +1,78 @@
+"""
+signal-driven waits for selenium pages.
+
+instead of sleeping a fixed 3-6s, wait until the document is ready and the
+page has gone quiet: no new dom nodes and no finished network requests for
+`quiet_ms`. all checks run inside the page in a single async script call.
+"""
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger("scraper")
+
+# resolves when the page has been quiet for quietMs or timeoutMs has passed.
+# "quiet" = readyState complete, no added nodes and no new resource timing entries.
+_QUIET_JS = """
+const [quietMs, timeoutMs, done] = arguments;
+const start = performance.now();
+let lastChange = start;
+let resources = 0;
+try {
+    performance.setResourceTimingBufferSize(10000);
+    resources = performance.getEntriesByType('resource').length;
+} catch (e) {}
+
+const observer = new MutationObserver((mutations) => {
+    for (const m of mutations) {
+        if (m.addedNodes && m.addedNodes.length) { lastChange = performance.now(); return; }
+    }
+});
+observer.observe(document.documentElement || document, {childList: true, subtree: true});
+
+(function tick() {
+    const now = performance.now();
+    let count = resources;
+    try { count = performance.getEntriesByType('resource').length; } catch (e) {}
+    if (count !== resources) { resources = count; lastChange = now; }
+
+    const ready = document.readyState === 'complete';
+    const quiet = ready && now - lastChange >= quietMs;
+    if (quiet || now - start >= timeoutMs) {
+        observer.disconnect();
+        done({quiet: quiet, ready: ready, waited_ms: Math.round(now - start)});
+        return;
+    }
+    setTimeout(tick, 50);
+})();
+"""
+
+
+def jitter_enabled():
+    """human-like random pauses; on by default, SCRAPE_JITTER=0 turns them off"""
+    return os.environ.get("SCRAPE_JITTER", "1") != "0"
+
+
+def jitter(low, high):
+    """sleep a random amount if jitter is enabled"""
+    if jitter_enabled() and high > 0:
+        time.sleep(random.uniform(low, high))
+
+
+def wait_for_quiet(driver, quiet_ms=500, timeout=6.0):
+    """
+    block until the page is loaded and stable, or `timeout` seconds pass.
+    returns the in-page report ({quiet, ready, waited_ms}).
+    """
+    started = time.time()
+    try:
+        driver.set_script_timeout(timeout + 5)
+        return driver.execute_async_script(_QUIET_JS, int(quiet_ms), int(timeout * 1000))
+    except Exception as e:
+        # page navigated mid-check or scripts are blocked: fall back to the remaining budget
+        logger.debug(f"quiet wait failed: {e}")
+        remaining = timeout - (time.time() - started)
+        if remaining > 0:
+            time.sleep(min(remaining, 1.0))
+        return {"quiet": False, "ready": None, "waited_ms": int((time.time() - started) * 1000)}
@@ -0,0 +1,225 @@
+"""
+pools of long-lived helper processes that answer one request at a time over
+their stdin/stdout pipes.
+
+transcript_workers (json lines) and decode_workers (pickle) both run on this:
+a pool starts `python -u <script>` itself instead of going through
+multiprocessing's spawn, which would re-import the server's __main__ (wsgi.py
+-> main) and with it the flask app, the driver pool and every cache. the
+script's `__main__` block calls `serve()` with the same framing.
+"""
+import json
+import logging
+import os
+import pickle
+import queue
+import select
+import subprocess
+import sys
+import threading
+import time
+
+logger = logging.getLogger("scraper")
+
+
+class WorkersBusy(Exception):
+    """no worker freed up within the pool's timeout"""
+
+
+class WorkerCrashed(Exception):
+    """the worker died, timed out or sent garbage; it has already been killed"""
+
+
+# framing
+
+class JsonLines:
+    """one json document per line; for small, plain-data requests and answers"""
+
+    @staticmethod
+    def dump(message, stream):
+        stream.write(json.dumps(message).encode("utf-8") + b"\n")
+
+    @staticmethod
+    def load(stream):
+        line = stream.readline()
+        if not line:
+            raise EOFError
+        return json.loads(line)
+
+
+class Pickled:
+    """pickle frames; for answers carrying bytes (jpeg frames, ...)"""
+
+    @staticmethod
+    def dump(message, stream):
+        pickle.dump(message, stream, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(stream):
+        return pickle.load(stream)
+
+
+class _Worker:
+    def __init__(self, script):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-u", script],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=None,  # worker logs (and ffmpeg's) go straight to ours
+        )
+        self.served = 0
+        self.started = time.time()
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def kill(self):
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+
+
+class PipeWorkerPool:
+    """
+    at most `size` workers running `script`, started on demand; each handles
+    one request at a time. a worker that times out or crashes is killed, and
+    workers are recycled after `max_tasks` requests to bound leaks in whatever
+    library they wrap.
+    """
+
+    def __init__(self, name, script, framing, size=1, timeout=30, max_tasks=500):
+        self.name = name
+        self.script = os.path.abspath(script)
+        self.framing = framing
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._stats = {"spawned": 0, "requests": 0, "timeouts": 0, "crashes": 0, "recycled": 0}
+        self._busy = 0
+
+    def warm_up(self, count=1):
+        for _ in range(min(count, self.size)):
+            if not self._slots.acquire(blocking=False):
+                return
+            try:
+                self._idle.put(self._spawn())
+            except Exception as e:
+                logger.warning(f"{self.name} worker warm-up failed: {e}")
+            finally:
+                self._slots.release()
+
+    def request(self, message):
+        """send `message` to a free worker and return its answer; raises WorkersBusy or WorkerCrashed"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise WorkersBusy(f"all {self.name} workers busy")
+
+        worker = None
+        with self._lock:
+            self._busy += 1
+        try:
+            worker = self._checkout()
+            self._count("requests")
+            answer = self._roundtrip(worker, message)
+            worker.served += 1
+            return answer
+        except WorkerCrashed:
+            worker.kill()
+            worker = None
+            raise
+        finally:
+            if worker is not None:
+                self._checkin(worker)
+            with self._lock:
+                self._busy -= 1
+            self._slots.release()
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.proc.stdin.close()
+            except Exception:
+                pass
+            worker.kill()
+
+    def _roundtrip(self, worker, message):
+        try:
+            self.framing.dump(message, worker.proc.stdin)
+            worker.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self._count("crashes")
+            raise WorkerCrashed(f"{self.name} worker pipe closed: {e}")
+
+        ready, _, _ = select.select([worker.proc.stdout], [], [], self.timeout)
+        if not ready:
+            self._count("timeouts")
+            raise WorkerCrashed(f"{self.name} worker timed out after {self.timeout}s")
+
+        try:
+            return self.framing.load(worker.proc.stdout)
+        except EOFError:
+            self._count("crashes")
+            raise WorkerCrashed(f"{self.name} worker exited with code {worker.proc.poll()}")
+        except (ValueError, pickle.UnpicklingError):
+            self._count("crashes")
+            raise WorkerCrashed(f"{self.name} worker sent malformed output")
+
+    def _checkout(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return self._spawn()
+            if worker.alive():
+                return worker
+            self._count("crashes")
+            worker.kill()
+
+    def _checkin(self, worker):
+        if not worker.alive():
+            return
+        if self.max_tasks and worker.served >= self.max_tasks:
+            self._count("recycled")
+            worker.kill()
+            return
+        self._idle.put(worker)
+
+    def _spawn(self):
+        self._count("spawned")
+        return _Worker(self.script)
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "busy": self._busy, "idle": self._idle.qsize(), **self._stats}
+
+
+# worker side
+
+def serve(framing, handle):
+    """answer each request on stdin with handle(request) until the pool closes the pipe"""
+    # the protocol owns fd 1; python prints and anything native code writes to stdout go to stderr
+    out = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    requests_in = sys.stdin.buffer
+
+    while True:
+        try:
+            message = framing.load(requests_in)
+        except EOFError:
+            return
+        framing.dump(handle(message), out)
+        out.flush()
@@ -0,0 +1,110 @@
+"""
+browserless reddit thread search for /tools/reddit_search.
+
+queries go to duckduckgo's no-js html endpoint over the pooled http session
+and the result page is parsed with lxml. SearchFailed means the endpoint
+blocked us or its markup changed, and only then does the caller fall back to
+the browser path.
+"""
+import logging
+import os
+import re
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from cooperative import offload
+from extract import lxml_document
+from http_client import fetch_text
+
+logger = logging.getLogger("scraper")
+
+# override to point at a mirror or a local fixture server
+DDG_HTML_URL = os.environ.get("REDDIT_SEARCH_DDG_URL", "https://html.duckduckgo.com/html/")
+
+# duckduckgo's "are you a bot" page answers 200/202 with one of these
+DDG_BLOCK_MARKERS = ["anomaly-modal", "bots use duckduckgo too", "challenge-form"]
+DDG_NO_RESULTS_MARKERS = ["no-results", "no results."]
+
+# html endpoint uses result__a, lite uses result-link
+_RESULT_XPATH = "//a[contains(concat(' ', normalize-space(@class), ' '), ' result__a ') or contains(@class, 'result-link')]"
+
+_THREAD_RE = re.compile(r"^/r/([^/]+)/comments/([a-z0-9]+)(?:/([^/?#]*))?", re.IGNORECASE)
+
+
+class SearchFailed(Exception):
+    """the http search gave no usable answer; the browser path should take over"""
+
+
+class SearchBlocked(SearchFailed):
+    """duckduckgo served its bot check"""
+
+
+def normalize_query(query):
+    return " ".join((query or "").lower().split())
+
+
+def thread_url(href):
+    """canonical https://www.reddit.com/r/<sub>/comments/<id>/<slug>/ for a thread link, else None"""
+    if not href:
+        return None
+    parts = urlsplit(href if "//" in href else "https://" + href)
+    # ddg wraps results as //duckduckgo.com/l/?uddg=<target>
+    if parts.path.startswith("/l/") and "uddg" in parse_qs(parts.query):
+        return thread_url(parse_qs(parts.query)["uddg"][0])
+
+    host = (parts.hostname or "").lower()
+    if not (host == "reddit.com" or host.endswith(".reddit.com")):
+        return None
+    match = _THREAD_RE.match(parts.path)
+    if not match:
+        return None
+    sub, thread_id, slug = match.groups()
+    return f"https://www.reddit.com/r/{sub}/comments/{thread_id}/{slug + '/' if slug else ''}"
+
+
+def parse_results(html, limit=5):
+    """
+    reddit threads from a ddg html/lite result page, deduped by thread id.
+    raises SearchFailed on block pages and pages without any result markup.
+    """
+    lowered = html.lower()
+    if any(marker in lowered for marker in DDG_BLOCK_MARKERS):
+        raise SearchBlocked("blocked")
+
+    doc = lxml_document(html)
+    anchors = doc.xpath(_RESULT_XPATH)
+    if not anchors:
+        if any(marker in lowered for marker in DDG_NO_RESULTS_MARKERS):
+            return []
+        raise SearchFailed("no result markup")
+
+    links = []
+    seen = set()
+    for a in anchors:
+        url = thread_url(a.get("href"))
+        if not url:
+            continue
+        thread_id = url.split("/comments/")[1].split("/")[0]
+        if thread_id in seen:
+            continue
+        seen.add(thread_id)
+        links.append({"title": a.text_content().strip() or "Reddit Thread", "url": url})
+        if len(links) >= limit:
+            break
+    return links
+
+
+def search_http(query, limit=5, timeout=8):
+    """site:reddit.com search over plain http; raises SearchFailed when the browser should be used"""
+    url = f"{DDG_HTML_URL}?{urlencode({'q': f'site:reddit.com {query}'})}"
+    try:
+        resp, html = fetch_text(url, timeout=timeout, headers={"Referer": "https://html.duckduckgo.com/"})
+    except Exception as e:
+        raise SearchFailed(f"http error: {e.__class__.__name__}")
+    if resp.status_code != 200:
+        raise SearchFailed(f"status {resp.status_code}")
+    try:
+        return offload(parse_results, html, limit)
+    except SearchFailed:
+        raise
+    except Exception as e:
+        raise SearchFailed(f"unparseable html: {e.__class__.__name__}")
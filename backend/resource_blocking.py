@@ -0,0 +1,140 @@
+"""
+resource blocking for headless scraping.
+
+/scrape and /tools/market_deep_dive only read dom text, so images, media,
+fonts and tracker scripts are dead weight. a blocking profile is applied per
+checkout through CDP's Network.setBlockedURLs and cleared afterwards; the
+performance log tells us what was transferred and what was blocked.
+"""
+import json
+import logging
+import os
+from contextlib import contextmanager
+
+logger = logging.getLogger("scraper")
+
+# url patterns per category ("*" matches anything). e-commerce image cdns serve
+# extensionless urls, so they get explicit host patterns.
+CATEGORY_PATTERNS = {
+    "images": [
+        "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.ico*", "*.bmp*",
+        "*cf.shopee.*/file/*", "*down-*.img.susercontent.com/file/*", "*img.lazcdn.com/*",
+        "*img.alicdn.com/*", "*m.media-amazon.com/images/*", "*images-na.ssl-images-amazon.com/*",
+    ],
+    "media": ["*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*", "*.m4s*"],
+    "fonts": ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*", "*fonts.googleapis.com*", "*fonts.gstatic.com*"],
+    "trackers": [
+        "*googletagmanager.com*", "*google-analytics.com*", "*doubleclick.net*",
+        "*googlesyndication.com*", "*connect.facebook.net*", "*facebook.com/tr*",
+        "*hotjar.com*", "*scorecardresearch.com*", "*criteo.*", "*amazon-adsystem.com*",
+        "*analytics.tiktok.com*", "*bat.bing.com*", "*clarity.ms*",
+    ],
+}
+
+BLOCK_PROFILES = {
+    "none": [],
+    "media": ["images", "media", "fonts"],
+    "lean": ["images", "media", "fonts", "trackers"],
+}
+
+# categories never blocked on a site (keyed by a substring of the host);
+# extend when a site is found to break under a profile
+DOMAIN_ALLOWLIST = {
+    "lazada": ["trackers"],
+}
+
+# rough transfer sizes used to estimate what a blocked request would have cost
+_AVG_BYTES = {"Image": 45_000, "Media": 600_000, "Font": 60_000, "Script": 40_000, "Stylesheet": 20_000}
+_DEFAULT_AVG_BYTES = 15_000
+
+
+def default_profile():
+    return os.environ.get("SCRAPE_BLOCK_PROFILE", "lean")
+
+
+def patterns_for(url, profile):
+    """blocked-url patterns for `profile` on `url`, minus the domain's allowlist"""
+    if profile not in BLOCK_PROFILES:
+        raise ValueError(f"Unknown block profile: {profile} (known: {', '.join(BLOCK_PROFILES)})")
+
+    allowed = set()
+    for key, categories in DOMAIN_ALLOWLIST.items():
+        if key in (url or "").lower():
+            allowed.update(categories)
+
+    patterns = []
+    for category in BLOCK_PROFILES[profile]:
+        if category not in allowed:
+            patterns.extend(CATEGORY_PATTERNS[category])
+    return patterns
+
+
+def _drain_performance_log(driver):
+    try:
+        return driver.get_log("performance")
+    except Exception:
+        return []
+
+
+def traffic_report(entries):
+    """summarize performance log entries: bytes transferred, requests blocked, bytes saved (estimated)"""
+    types = {}
+    transferred = 0
+    blocked = {}
+
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        method = message.get("method")
+        params = message.get("params", {})
+
+        if method in ("Network.requestWillBeSent", "Network.responseReceived"):
+            if params.get("type"):
+                types[params.get("requestId")] = params["type"]
+        elif method == "Network.loadingFinished":
+            transferred += int(params.get("encodedDataLength") or 0)
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            kind = params.get("type") or types.get(params.get("requestId")) or "Other"
+            blocked[kind] = blocked.get(kind, 0) + 1
+
+    saved = sum(count * _AVG_BYTES.get(kind, _DEFAULT_AVG_BYTES) for kind, count in blocked.items())
+    return {
+        "bytes_transferred": transferred,
+        "blocked_requests": sum(blocked.values()),
+        "blocked_by_type": blocked,
+        "est_bytes_saved": saved,
+    }
+
+
+@contextmanager
+def blocking(driver, url, profile=None):
+    """
+    apply a blocking profile for the duration of the block.
+    yields a report dict that is filled in on exit.
+    """
+    profile = profile or default_profile()
+    patterns = patterns_for(url, profile)
+    report = {"profile": profile}
+
+    # start from an empty log so the report only covers this request
+    _drain_performance_log(driver)
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        logger.warning(f"resource blocking unavailable: {e}")
+        patterns = None
+
+    try:
+        yield report
+    finally:
+        report.update(traffic_report(_drain_performance_log(driver)))
+        if patterns:
+            try:
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+            except Exception:
+                pass
+        if report["blocked_requests"]:
+            logger.info(f"blocked {report['blocked_requests']} requests (~{report['est_bytes_saved'] // 1024}KB saved) on {url[:80]}")
@@ -0,0 +1,215 @@
+"""
+per-domain scheduler for browser work.
+
+every browser-backed route takes a slot here before touching a site. each
+domain has a token bucket (sustained rate + burst), a cap on requests in
+flight, and an exponential backoff window that opens whenever a page comes
+back with a bot check. callers wait for a slot up to `max_wait` seconds and
+get Throttled after that.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import metrics
+
+logger = logging.getLogger("scraper")
+
+# per-domain overrides, matched by substring of the host
+DOMAIN_LIMITS = {
+    "shopee": {"rate": 0.5, "burst": 2, "max_in_flight": 2},
+    "lazada": {"rate": 0.5, "burst": 2, "max_in_flight": 2},
+    "amazon": {"rate": 0.5, "burst": 2, "max_in_flight": 2},
+    "duckduckgo": {"rate": 0.5, "burst": 2, "max_in_flight": 1},
+    "google": {"rate": 0.2, "burst": 1, "max_in_flight": 1},
+}
+
+
+class Throttled(Exception):
+    """no slot for the domain within max_wait"""
+
+    def __init__(self, domain, retry_after):
+        super().__init__(f"{domain} is throttled, retry in {retry_after:.0f}s")
+        self.domain = domain
+        self.retry_after = retry_after
+
+
+# second-level labels under a country tld (shopee.com.ph, amazon.co.uk)
+_SECOND_LEVEL_LABELS = {"co", "com", "net", "org", "gov", "edu", "ac"}
+
+
+def domain_of(url):
+    """
+    registrable domain of url's host, so sibling hosts share one rate limit and
+    backoff: html.duckduckgo.com and duckduckgo.com are the same site to its bot check.
+    """
+    host = (urlparse(url).hostname or "").lower()
+    labels = host.split(".")
+    if len(labels) <= 2 or ":" in host or host.replace(".", "").isdigit():
+        return host
+    keep = 3 if len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL_LABELS else 2
+    return ".".join(labels[-keep:])
+
+
+class _DomainState:
+    def __init__(self, rate, burst, max_in_flight):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self.in_flight = 0
+        self.strikes = 0
+        self.blocked_until = 0.0
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class Slot:
+    """handle for a granted slot; report bot checks or clean loads back to the scheduler"""
+
+    def __init__(self, scheduler, domain, waited):
+        self.scheduler = scheduler
+        self.domain = domain
+        self.waited = waited
+
+    def report_block(self):
+        self.scheduler.report_block(self.domain)
+
+    def report_ok(self):
+        self.scheduler.report_ok(self.domain)
+
+
+class DomainScheduler:
+    def __init__(self, rate=1.0, burst=3, max_in_flight=2, max_wait=60,
+                 backoff_base=30, backoff_max=600):
+        self.defaults = {"rate": rate, "burst": burst, "max_in_flight": max_in_flight}
+        self.max_wait = max_wait
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._domains = {}
+        self._cond = threading.Condition()
+        self._stats = {"granted": 0, "rejected": 0, "wait_total_s": 0.0, "wait_max_s": 0.0, "blocks_reported": 0}
+        self._throttle_events = {"rate": 0, "in_flight": 0, "backoff": 0}
+
+    def _state(self, domain):
+        state = self._domains.get(domain)
+        if state is None:
+            limits = dict(self.defaults)
+            for key, override in DOMAIN_LIMITS.items():
+                if key in domain:
+                    limits.update(override)
+                    break
+            state = self._domains[domain] = _DomainState(**limits)
+        return state
+
+    @contextmanager
+    def slot(self, url):
+        """wait for the url's domain to allow one more request, then hold the slot for the block"""
+        domain = domain_of(url)
+        started = time.time()
+        deadline = started + self.max_wait
+        throttled_for = set()
+
+        with self._cond:
+            while True:
+                now = time.time()
+                state = self._state(domain)
+                state.refill(now)
+
+                if now < state.blocked_until:
+                    reason, wait_s = "backoff", state.blocked_until - now
+                elif state.in_flight >= state.max_in_flight:
+                    reason, wait_s = "in_flight", self.max_wait
+                elif state.tokens < 1:
+                    reason, wait_s = "rate", (1 - state.tokens) / state.rate
+                else:
+                    state.tokens -= 1
+                    state.in_flight += 1
+                    break
+
+                if reason not in throttled_for:
+                    throttled_for.add(reason)
+                    self._throttle_events[reason] += 1
+
+                remaining = deadline - now
+                if remaining <= 0 or (reason == "backoff" and wait_s > remaining):
+                    self._stats["rejected"] += 1
+                    raise Throttled(domain, max(wait_s, 1))
+                self._cond.wait(min(wait_s, remaining))
+
+            waited = time.time() - started
+            self._stats["granted"] += 1
+            self._stats["wait_total_s"] += waited
+            self._stats["wait_max_s"] = max(self._stats["wait_max_s"], waited)
+
+        if waited > 1:
+            logger.info(f"waited {waited:.1f}s for a {domain} slot")
+
+        try:
+            yield Slot(self, domain, waited)
+        finally:
+            with self._cond:
+                self._state(domain).in_flight -= 1
+                self._cond.notify_all()
+
+    def report_block(self, domain):
+        """a bot check fired: back off exponentially (base, 2x base, ... up to backoff_max)"""
+        with self._cond:
+            state = self._state(domain)
+            state.strikes += 1
+            backoff = min(self.backoff_base * 2 ** (state.strikes - 1), self.backoff_max)
+            state.blocked_until = max(state.blocked_until, time.time() + backoff)
+            self._stats["blocks_reported"] += 1
+        metrics.BOT_TRIGGERS.inc(domain=domain)
+        logger.warning(f"bot check on {domain}, backing off {backoff:.0f}s (strike {state.strikes})")
+
+    def backoff_remaining(self, url):
+        """seconds left on the bot-check backoff of url's domain, 0.0 when there is none"""
+        with self._cond:
+            state = self._domains.get(domain_of(url))
+            return max(0.0, state.blocked_until - time.time()) if state else 0.0
+
+    def report_ok(self, domain):
+        with self._cond:
+            self._state(domain).strikes = 0
+
+    def stats(self):
+        with self._cond:
+            now = time.time()
+            granted = self._stats["granted"]
+            return {
+                "granted": granted,
+                "rejected": self._stats["rejected"],
+                "blocks_reported": self._stats["blocks_reported"],
+                "queue_wait_avg_s": round(self._stats["wait_total_s"] / granted, 3) if granted else 0.0,
+                "queue_wait_max_s": round(self._stats["wait_max_s"], 3),
+                "throttle_events": dict(self._throttle_events),
+                "domains": {
+                    domain: {
+                        "in_flight": state.in_flight,
+                        "tokens": round(min(state.burst, state.tokens + (now - state.updated) * state.rate), 2),
+                        "backoff_s": round(max(0.0, state.blocked_until - now), 1),
+                        "strikes": state.strikes,
+                    }
+                    for domain, state in self._domains.items()
+                },
+            }
+
+
+def scheduler_from_env():
+    """build the shared scheduler from SCHED_* env vars"""
+    return DomainScheduler(
+        rate=float(os.environ.get("SCHED_RATE", 1.0)),
+        burst=int(os.environ.get("SCHED_BURST", 3)),
+        max_in_flight=int(os.environ.get("SCHED_MAX_IN_FLIGHT", 2)),
+        max_wait=float(os.environ.get("SCHED_MAX_WAIT", 60)),
+        backoff_base=float(os.environ.get("SCHED_BACKOFF_BASE", 30)),
+        backoff_max=float(os.environ.get("SCHED_BACKOFF_MAX", 600)),
+    )
@@ -0,0 +1,202 @@
+"""
+in-memory cache for /scrape results.
+
+html and text are compressed (zstd when the zstandard package is installed,
+zlib otherwise) and kept under a byte budget with lru eviction. every entry
+is fresh for its domain's ttl, then stale for `stale_ttl` more seconds: stale
+entries are still served right away while the caller schedules a refresh.
+
+browser scrapes carry no usable http validators, so revalidation compares a
+digest of the new text with the cached one; unchanged pages only get their
+timestamps bumped.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from scheduler import domain_of
+
+logger = logging.getLogger("scraper")
+
+FRESH = "hit"
+STALE = "stale"
+
+# fresh ttl per domain in seconds (substring of the host); prices move fastest on flash-sale sites
+DOMAIN_TTLS = {
+    "shopee": 900,
+    "lazada": 900,
+    "amazon": 1800,
+}
+
+# fields compressed on their own; everything else is small and stored as json
+_BIG_FIELDS = ("html", "text")
+
+
+class _Codec:
+    def __init__(self):
+        if zstandard is not None:
+            self.name = "zstd"
+            self._local = threading.local()
+        else:
+            self.name = "zlib"
+
+    def compress(self, data):
+        if self.name == "zstd":
+            # zstd contexts are not thread safe
+            ctx = getattr(self._local, "c", None)
+            if ctx is None:
+                ctx = self._local.c = zstandard.ZstdCompressor(level=3)
+            return ctx.compress(data)
+        return zlib.compress(data, 6)
+
+    def decompress(self, blob):
+        if self.name == "zstd":
+            ctx = getattr(self._local, "d", None)
+            if ctx is None:
+                ctx = self._local.d = zstandard.ZstdDecompressor()
+            return ctx.decompress(blob)
+        return zlib.decompress(blob)
+
+
+class _Entry:
+    __slots__ = ("url", "stored_at", "fresh_until", "stale_until", "digest", "blobs", "meta", "size", "raw_size")
+
+
+class ScrapeCache:
+    def __init__(self, max_bytes=128 * 1024 * 1024, ttl=3600, stale_ttl=6 * 3600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._codec = _Codec()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "stores": 0, "unchanged": 0, "evictions": 0}
+
+    def ttl_for(self, url):
+        domain = domain_of(url)
+        for key, ttl in DOMAIN_TTLS.items():
+            if key in domain:
+                return ttl
+        return self.ttl
+
+    def get(self, key):
+        """(FRESH | STALE, result, age_s) or None; stale entries are served until stale_until"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.stale_until < now:
+                self._stats["misses"] += 1
+                if entry is not None:
+                    self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            status = FRESH if now < entry.fresh_until else STALE
+            self._stats["hits" if status == FRESH else "stale_hits"] += 1
+
+        return status, self._decode(entry), round(now - entry.stored_at, 1)
+
+    def put(self, key, url, result):
+        """store a scrape result; returns False when the text matches the cached copy (timestamps bumped only)"""
+        now = time.time()
+        ttl = self.ttl_for(url)
+        digest = hashlib.sha1((result.get("text") or "").encode("utf-8")).hexdigest()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.digest == digest:
+                entry.stored_at = now
+                entry.fresh_until = now + ttl
+                entry.stale_until = now + ttl + self.stale_ttl
+                self._entries.move_to_end(key)
+                self._stats["unchanged"] += 1
+                return False
+
+        # compress outside the lock, it's the expensive part
+        entry = _Entry()
+        entry.url = url
+        entry.stored_at = now
+        entry.fresh_until = now + ttl
+        entry.stale_until = now + ttl + self.stale_ttl
+        entry.digest = digest
+        entry.blobs = {}
+        entry.raw_size = 0
+        for field in _BIG_FIELDS:
+            raw = (result.get(field) or "").encode("utf-8")
+            entry.blobs[field] = self._codec.compress(raw)
+            entry.raw_size += len(raw)
+        entry.meta = json.dumps({k: v for k, v in result.items() if k not in _BIG_FIELDS}).encode("utf-8")
+        entry.size = sum(len(b) for b in entry.blobs.values()) + len(entry.meta)
+
+        if entry.size > self.max_bytes:
+            return True
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._stats["stores"] += 1
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+        return True
+
+    def begin_refresh(self, key):
+        """claim the background refresh for key; False when one is already running"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def _decode(self, entry):
+        result = json.loads(entry.meta)
+        for field, blob in entry.blobs.items():
+            result[field] = self._codec.decompress(blob).decode("utf-8")
+        return result
+
+    def _drop(self, key):
+        # caller holds self._lock
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self):
+        with self._lock:
+            raw = sum(e.raw_size for e in self._entries.values())
+            return {
+                "codec": self._codec.name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "compression_ratio": round(raw / self._bytes, 2) if self._bytes else None,
+                "refreshing": len(self._refreshing),
+                **self._stats,
+            }
+
+
+def scrape_cache_from_env():
+    """build the shared cache from SCRAPE_CACHE_* env vars"""
+    return ScrapeCache(
+        # lives in this process's rss, so it comes out of the chrome memory budget (MEMORY_BUDGET_MB)
+        max_bytes=int(os.environ.get("SCRAPE_CACHE_MB", 24)) * 1024 * 1024,
+        ttl=int(os.environ.get("SCRAPE_CACHE_TTL", 3600)),
+        stale_ttl=int(os.environ.get("SCRAPE_CACHE_STALE_TTL", 6 * 3600)),
+    )
@@ -0,0 +1,251 @@
+"""
+stealth page scraping for /scrape.
+optimized for amazon, shopee and lazada.
+"""
+import logging
+import os
+import random
+
+from cooperative import offload
+from extract import extract_text
+from jobs import JobCancelled
+import metrics
+from page_wait import jitter, wait_for_quiet
+
+logger = logging.getLogger("scraper")
+
+# per-domain scroll budget and per-step pause range (seconds, only with jitter on).
+# shopee needs aggressive scrolling to trigger lazy load.
+SCROLL_PROFILES = {
+    "shopee": {"max_scroll": 15000, "pause": (0.1, 0.3)},
+    "lazada": {"max_scroll": 8000, "pause": (0.1, 0.3)},
+    "amazon": {"max_scroll": 8000, "pause": (0.05, 0.2)},
+}
+DEFAULT_SCROLL_PROFILE = {"max_scroll": 8000, "pause": (0.05, 0.2)}
+
+# how long the page must stay unchanged to count as loaded / settled
+LOAD_QUIET_MS = int(os.environ.get("SCRAPE_LOAD_QUIET_MS", 500))
+SCROLL_QUIET_MS = int(os.environ.get("SCRAPE_SCROLL_QUIET_MS", 250))
+
+# consecutive bottom-of-page checks without growth before we stop scrolling
+STALL_LIMIT = 2
+
+BOT_TRIGGERS = ["robot check", "captcha", "security challenge", "automated access"]
+
+_SCROLL_JS = """
+window.scrollTo(0, arguments[0]);
+return [document.body.scrollHeight, window.innerHeight];
+"""
+
+# per-domain css selectors for the things callers usually want from a product page.
+# the first selector with enough visible text wins.
+TARGET_SELECTORS = {
+    "amazon": {
+        "title": ["#productTitle", "#title"],
+        "price": ["#corePrice_feature_div .a-offscreen", ".a-price .a-offscreen", ".a-price-whole", "#priceblock_ourprice"],
+        "rating": ["#acrPopover .a-icon-alt", "[data-hook='rating-out-of-text']", "#averageCustomerReviews"],
+        "reviews": ["#cm-cr-dp-review-list", "[data-hook='review']", "#customer-reviews_feature_div"],
+    },
+    "shopee": {
+        "title": [".product-briefing h1", "[class*='product-title']", "h1"],
+        "price": [".product-briefing [class*='price']", "[class*='pqTWkA']", "[class*='price']"],
+        "rating": [".product-rating-overview__rating-score", "[class*='rating-score']"],
+        "reviews": [".product-ratings__list", ".shopee-product-rating", "[class*='product-ratings']"],
+    },
+    "lazada": {
+        "title": [".pdp-mod-product-badge-title", "h1"],
+        "price": [".pdp-price_type_normal", ".pdp-price", "[class*='pdp-price']"],
+        "rating": [".score-average", ".container-star"],
+        "reviews": [".mod-reviews", ".pdp-mod-review", "[class*='review-list']"],
+    },
+}
+DEFAULT_TARGET_SELECTORS = {
+    "title": ["h1", "[itemprop='name']"],
+    "price": ["[itemprop='price']", "[class*='product-price']", "[class*='price']"],
+    "rating": ["[itemprop='ratingValue']", "[class*='rating']"],
+    "reviews": ["[itemprop='review']", "#reviews", "[class*='reviews']"],
+}
+KNOWN_TARGETS = sorted(DEFAULT_TARGET_SELECTORS)
+
+# review blocks render a header long before the reviews themselves
+MIN_TARGET_CHARS = {"reviews": 80}
+
+# returns {target: text} for every target whose selectors currently match visible text
+_TARGETS_JS = """
+const [wanted, minChars] = arguments;
+const found = {};
+for (const [name, selectors] of Object.entries(wanted)) {
+    for (const sel of selectors) {
+        let el = null;
+        try { el = document.querySelector(sel); } catch (e) { continue; }
+        if (!el) continue;
+        const text = (el.innerText || el.textContent || el.getAttribute('content') || '').trim();
+        if (text.length >= (minChars[name] || 1)) { found[name] = text.slice(0, 4000); break; }
+    }
+}
+return found;
+"""
+
+
+def scroll_profile(url):
+    """scroll settings for a url; SCRAPE_MAX_SCROLL_<DOMAIN> overrides the table"""
+    for key, profile in SCROLL_PROFILES.items():
+        if key in url:
+            profile = dict(profile)
+            override = os.environ.get(f"SCRAPE_MAX_SCROLL_{key.upper()}")
+            if override:
+                profile["max_scroll"] = int(override)
+            return profile
+    return dict(DEFAULT_SCROLL_PROFILE)
+
+
+def parse_targets(raw):
+    """"price, reviews" -> ["price", "reviews"]; raises ValueError on unknown names"""
+    targets = [t.strip().lower() for t in (raw or "").split(",") if t.strip()]
+    unknown = [t for t in targets if t not in KNOWN_TARGETS]
+    if unknown:
+        raise ValueError(f"Unknown targets: {', '.join(unknown)} (known: {', '.join(KNOWN_TARGETS)})")
+    return list(dict.fromkeys(targets))
+
+
+def target_selectors(url, targets):
+    for key, registry in TARGET_SELECTORS.items():
+        if key in url:
+            return {t: registry.get(t, DEFAULT_TARGET_SELECTORS[t]) for t in targets}
+    return {t: DEFAULT_TARGET_SELECTORS[t] for t in targets}
+
+
+def capture_targets(driver, selectors, found):
+    """evaluate every outstanding target in one script call; returns True once all are found"""
+    missing = {name: sels for name, sels in selectors.items() if name not in found}
+    if not missing:
+        return True
+    try:
+        found.update(driver.execute_script(_TARGETS_JS, missing, MIN_TARGET_CHARS) or {})
+    except Exception as e:
+        logger.debug(f"target capture failed: {e}")
+    return len(found) == len(selectors)
+
+
+def check_cancel(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled("scrape cancelled")
+
+
+def adaptive_scroll(driver, profile, selectors=None, found=None, cancel_event=None):
+    """
+    scroll in random steps until max_scroll or until the page stops growing.
+    at the bottom we wait for lazy loaders to go quiet; if the height didn't
+    change after that, there's nothing more to load.
+    with `selectors`, targets are captured into `found` after every step and
+    scrolling stops as soon as all of them are in.
+    returns how far we scrolled, in px.
+    """
+    scroll_step = random.randint(300, 700)
+    max_scroll = profile["max_scroll"]
+    pause_low, pause_high = profile["pause"]
+
+    current_pos = 0
+    stalled = 0
+    total_height, viewport = driver.execute_script(_SCROLL_JS, 0)
+
+    while current_pos < max_scroll:
+        check_cancel(cancel_event)
+        current_pos = min(current_pos + scroll_step, max_scroll)
+        height, viewport = driver.execute_script(_SCROLL_JS, current_pos)
+
+        # variable pause to mimic reading
+        jitter(pause_low, pause_high)
+
+        if selectors and capture_targets(driver, selectors, found):
+            break
+
+        if current_pos + viewport < height:
+            total_height = max(total_height, height)
+            continue
+
+        # at the bottom: give lazy loading a chance, then check for growth
+        wait_for_quiet(driver, quiet_ms=SCROLL_QUIET_MS, timeout=2.0)
+        new_height = int(driver.execute_script("return document.body.scrollHeight"))
+        if new_height > total_height:
+            total_height = new_height
+            stalled = 0
+        else:
+            stalled += 1
+            if stalled >= STALL_LIMIT:
+                break
+
+    return current_pos
+
+
+def scrape_page(driver, url, targets=None, cancel_event=None):
+    """
+    load `url` in a checked-out driver and return the /scrape response body.
+    `targets` (e.g. ["price", "reviews"]) ends scrolling early once all are captured.
+    `cancel_event` is checked between phases and scroll steps (background jobs).
+    """
+    driver.set_page_load_timeout(60) # increased timeout for heavy sites
+
+    with metrics.stage("navigate"):
+        driver.get(url)
+
+        # 1. wait for the page to settle instead of a fixed sleep, with a little human jitter
+        wait_for_quiet(driver, quiet_ms=LOAD_QUIET_MS, timeout=6.0)
+        jitter(0.2, 0.8)
+    check_cancel(cancel_event)
+
+    # 2. domain specific handling
+    current_url = driver.current_url.lower()
+
+    if "lazada" in current_url:
+        # try to close regional popup if exists
+        from selenium.webdriver.common.by import By
+        try:
+            close_btn = driver.find_element(By.XPATH, "//a[contains(@className, 'close')] | //button[contains(text(), 'X')]")
+            close_btn.click()
+            wait_for_quiet(driver, quiet_ms=SCROLL_QUIET_MS, timeout=1.0)
+        except:
+            pass
+
+    # 3. human-like scroll that stops once the page stops growing (or every target is in)
+    selectors = target_selectors(current_url, targets) if targets else None
+    found = {}
+    with metrics.stage("scroll"):
+        if selectors and capture_targets(driver, selectors, found):
+            scrolled = 0
+        else:
+            scrolled = adaptive_scroll(driver, scroll_profile(current_url), selectors, found, cancel_event)
+        logger.info(f"scrolled {scrolled}px on {current_url[:80]}")
+
+        # settle after scrolling; not needed when we stopped because everything was found
+        if not selectors or len(found) < len(selectors):
+            wait_for_quiet(driver, quiet_ms=SCROLL_QUIET_MS, timeout=2.0)
+            if selectors:
+                capture_targets(driver, selectors, found)
+
+    # 4. content extraction (single pass, stops at the output budget)
+    with metrics.stage("page_source"):
+        content = driver.page_source
+    with metrics.stage("extract"):
+        clean_text = offload(extract_text, content, budget=20000)
+
+    # validation checks
+    bot_triggered = any(t in clean_text.lower() for t in BOT_TRIGGERS)
+    if len(clean_text) < 200 or bot_triggered:
+        logger.warning(f"Scrape suspicious: length={len(clean_text)}, bot_triggered={bot_triggered}")
+        # we return what we have, but log warning.
+
+    result = {
+        "url": url,
+        "html": content[:500000], # limit size to avoid payload errors
+        "text": clean_text[:20000],
+        "scrolled_px": scrolled,
+        "bot_triggered": bot_triggered
+    }
+    if selectors:
+        result["targets"] = {
+            "requested": list(selectors),
+            "found": {name: found[name] for name in selectors if name in found},
+            "missing": [name for name in selectors if name not in found]
+        }
+    return result
@@ -0,0 +1,158 @@
+"""
+single-flight coalescing for duplicate requests.
+
+when several clients ask for the same product page, link or video at the same
+time, only the first call (the leader) does the work; the rest wait on it and
+get the same result. an optional short ttl keeps finished results around so a
+burst that arrives just after the leader finishes is served too.
+
+keys are built with normalize_url, which drops tracking params so that
+?utm_source=... variants of one link coalesce.
+"""
+import logging
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger("scraper")
+
+# query params that never change the page (matched exactly or by prefix)
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "gclsrc", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "ref", "ref_", "spm", "scm", "clickTrackInfo", "sp_atk", "xptdk", "trackingId",
+}
+TRACKING_PREFIXES = ("utm_", "pd_rd_", "pf_rd_", "sc_", "ad_")
+
+LEADER = "leader"
+COALESCED = "coalesced"
+CACHED = "cached"
+
+
+def _is_tracking(name):
+    return name in TRACKING_PARAMS or name.lower().startswith(TRACKING_PREFIXES)
+
+
+def normalize_url(url):
+    """lowercase scheme/host, drop fragment, default port and tracking params, sort the rest"""
+    url = (url or "").strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.netloc:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(k))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    run fn once per key at a time. `do` returns (result, how) where how is
+    leader, coalesced or cached; the leader's exception is raised in every waiter.
+    """
+
+    def __init__(self, name, ttl=0, max_entries=1000):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._results = {}
+        self._stats = {LEADER: 0, COALESCED: 0, CACHED: 0, "errors": 0}
+
+    def _cached(self, key, now):
+        # caller holds self._lock
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            del self._results[key]
+            return None
+        return entry
+
+    def _remember(self, key, result, now):
+        # caller holds self._lock
+        if len(self._results) >= self.max_entries:
+            expired = [k for k, (expires, _) in self._results.items() if expires < now]
+            for k in expired or [min(self._results, key=lambda k: self._results[k][0])]:
+                del self._results[k]
+        self._results[key] = (now + self.ttl, result)
+
+    def do(self, key, fn, cacheable=None):
+        """
+        call fn() unless an identical call is running or recently finished.
+        `cacheable(result)` decides whether a result may be reused after the flight ends.
+        """
+        with self._lock:
+            now = time.time()
+            if self.ttl > 0:
+                entry = self._cached(key, now)
+                if entry is not None:
+                    self._stats[CACHED] += 1
+                    return entry[1], CACHED
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self._stats[COALESCED] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self._stats[LEADER] += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, COALESCED
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is not None:
+                    self._stats["errors"] += 1
+                elif self.ttl > 0 and (cacheable is None or cacheable(flight.result)):
+                    self._remember(key, flight.result, time.time())
+            flight.done.set()
+            if flight.waiters:
+                logger.info(f"{self.name}: {flight.waiters} duplicate requests shared one fetch")
+
+        return flight.result, LEADER
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ttl_s": self.ttl,
+                "in_flight": len(self._flights),
+                "cached": len(self._results),
+                **self._stats,
+            }
+
+
+def flight_from_env(name, default_ttl=0):
+    """SingleFlight for `name`; SINGLEFLIGHT_<NAME>_TTL sets its result ttl in seconds (0 = coalesce only)"""
+    ttl = float(os.environ.get(f"SINGLEFLIGHT_{name.upper()}_TTL", default_ttl))
+    return SingleFlight(name, ttl=ttl)
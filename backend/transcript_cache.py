@@ -0,0 +1,200 @@
+"""
+disk-backed transcript cache.
+
+transcripts are stored columnar (text/start/duration arrays) and zlib
+compressed in a single sqlite file, keyed by (video_id, lang). entries expire
+after a ttl and the least recently read ones are evicted once the payloads
+exceed a byte budget. videos youtube says have no transcript are cached
+briefly as negative entries, with the reason, so they aren't refetched on
+every request.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+
+logger = logging.getLogger("scraper")
+
+HIT = "hit"
+NEGATIVE = "negative"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB,
+    reason TEXT,
+    PRIMARY KEY (video_id, lang)
+);
+CREATE INDEX IF NOT EXISTS transcripts_accessed ON transcripts (accessed_at);
+"""
+
+
+def pack(transcript):
+    """list of {text, start, duration} dicts -> compressed columnar blob"""
+    columns = {
+        "text": [seg.get("text", "") for seg in transcript],
+        "start": [seg.get("start", 0) for seg in transcript],
+        "duration": [seg.get("duration", 0) for seg in transcript],
+    }
+    return zlib.compress(json.dumps(columns, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def unpack(blob):
+    columns = json.loads(zlib.decompress(blob))
+    return [
+        {"text": text, "start": start, "duration": duration}
+        for text, start, duration in zip(columns["text"], columns["start"], columns["duration"])
+    ]
+
+
+class TranscriptCache:
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, ttl=7 * 24 * 3600, negative_ttl=600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._write_lock:
+            conn = self._conn()
+            conn.executescript(_SCHEMA)
+            try:
+                # caches written before negative entries kept their reason
+                conn.execute("ALTER TABLE transcripts ADD COLUMN reason TEXT")
+            except sqlite3.OperationalError:
+                pass
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, video_id, lang):
+        """
+        returns (HIT, transcript), (NEGATIVE, reason) or None on a miss.
+        never touches the network.
+        """
+        now = time.time()
+        try:
+            row = self._conn().execute(
+                "SELECT expires_at, payload, reason FROM transcripts WHERE video_id = ? AND lang = ?",
+                (video_id, lang),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"transcript cache read failed: {e}")
+            return None
+
+        if row is None or row[0] < now:
+            self._count("misses")
+            if row is not None:
+                self._delete(video_id, lang)
+            return None
+
+        self._touch(video_id, lang, now)
+        if row[1] is None:
+            self._count("negative_hits")
+            return NEGATIVE, row[2]
+
+        self._count("hits")
+        return HIT, unpack(row[1])
+
+    def put(self, video_id, lang, transcript):
+        self._store(video_id, lang, pack(transcript), self.ttl)
+
+    def put_negative(self, video_id, lang, reason=None):
+        self._store(video_id, lang, None, self.negative_ttl, reason)
+
+    def _store(self, video_id, lang, blob, ttl, reason=None):
+        now = time.time()
+        size = len(blob) if blob else 0
+        try:
+            with self._write_lock:
+                conn = self._conn()
+                conn.execute(
+                    "INSERT OR REPLACE INTO transcripts "
+                    "(video_id, lang, stored_at, accessed_at, expires_at, size, payload, reason) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (video_id, lang, now, now, now + ttl, size, blob, reason),
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"transcript cache write failed: {e}")
+
+    def _touch(self, video_id, lang, now):
+        try:
+            with self._write_lock:
+                self._conn().execute(
+                    "UPDATE transcripts SET accessed_at = ? WHERE video_id = ? AND lang = ?",
+                    (now, video_id, lang),
+                )
+        except sqlite3.Error:
+            pass
+
+    def _delete(self, video_id, lang):
+        try:
+            with self._write_lock:
+                self._conn().execute("DELETE FROM transcripts WHERE video_id = ? AND lang = ?", (video_id, lang))
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn):
+        """drop expired rows, then least recently read ones until under budget"""
+        conn.execute("DELETE FROM transcripts WHERE expires_at < ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        freed = 0
+        victims = []
+        for video_id, lang, size in conn.execute(
+            "SELECT video_id, lang, size FROM transcripts ORDER BY accessed_at ASC"
+        ):
+            if total - freed <= self.max_bytes:
+                break
+            victims.append((video_id, lang))
+            freed += size
+
+        conn.executemany("DELETE FROM transcripts WHERE video_id = ? AND lang = ?", victims)
+        self._count("evictions", len(victims))
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def stats(self):
+        try:
+            entries, size = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes, **self._stats}
+
+
+def cache_from_env():
+    """build the shared cache from TRANSCRIPT_CACHE_* env vars"""
+    cache_dir = os.environ.get("TRANSCRIPT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "skeptek-cache"))
+    return TranscriptCache(
+        os.path.join(cache_dir, "transcripts.sqlite3"),
+        max_bytes=int(os.environ.get("TRANSCRIPT_CACHE_MB", 64)) * 1024 * 1024,
+        ttl=int(os.environ.get("TRANSCRIPT_CACHE_TTL", 7 * 24 * 3600)),
+        negative_ttl=int(os.environ.get("TRANSCRIPT_NEGATIVE_TTL", 600)),
+    )
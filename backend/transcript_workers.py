@@ -0,0 +1,101 @@
+"""
+pool of long-lived youtube_transcript_api worker processes.
+
+the transcript library stays isolated in its own interpreter (it used to be
+run as `python -m youtube_transcript_api` per request), but each worker keeps
+it imported and answers many requests over a json-lines pipe (see
+pipe_workers), so a request only pays for the actual fetch.
+
+run directly (`python transcript_workers.py`) this file is the worker loop.
+"""
+import os
+
+import pipe_workers
+from pipe_workers import JsonLines, PipeWorkerPool, WorkersBusy, serve
+
+
+# youtube_transcript_api errors that are youtube's answer about the video itself,
+# as opposed to ip blocks, rate limits and network trouble
+DEFINITIVE_ERRORS = {
+    "TranscriptsDisabled", "NoTranscriptFound", "NoTranscriptAvailable",
+    "VideoUnavailable", "VideoUnplayable", "InvalidVideoId", "AgeRestricted",
+}
+
+
+class TranscriptError(Exception):
+    """the worker answered, but with an error (disabled captions, ip block, ...)"""
+
+    def __init__(self, message, kind=None):
+        super().__init__(message)
+        self.kind = kind
+
+    @property
+    def definitive(self):
+        """youtube says this video has no transcript; retrying soon won't change that"""
+        return self.kind in DEFINITIVE_ERRORS
+
+
+class WorkerCrashed(TranscriptError):
+    """the worker died or timed out; it has already been killed"""
+
+
+class TranscriptWorkerPool(PipeWorkerPool):
+    """
+    at most `size` workers running this file; each handles one request at a
+    time, with the kill / recycle rules of PipeWorkerPool.
+    """
+
+    def __init__(self, size=2, timeout=30, max_tasks=500):
+        super().__init__("transcript", __file__, JsonLines, size=size, timeout=timeout, max_tasks=max_tasks)
+
+    def fetch(self, video_id, languages=("en",)):
+        """return the raw transcript list or raise TranscriptError"""
+        try:
+            result = self.request({"video_id": video_id, "languages": list(languages)})
+        except WorkersBusy as e:
+            raise TranscriptError(str(e))
+        except pipe_workers.WorkerCrashed as e:
+            raise WorkerCrashed(str(e))
+
+        if not result.get("ok"):
+            raise TranscriptError(result.get("error", "unknown error"), kind=result.get("error_type"))
+        return result["transcript"]
+
+
+def pool_from_env():
+    """build the shared pool from TRANSCRIPT_WORKER_* env vars"""
+    return TranscriptWorkerPool(
+        size=int(os.environ.get("TRANSCRIPT_WORKERS", 2)),
+        timeout=float(os.environ.get("TRANSCRIPT_WORKER_TIMEOUT", 30)),
+        max_tasks=int(os.environ.get("TRANSCRIPT_WORKER_MAX_TASKS", 500)),
+    )
+
+
+# worker side
+
+def _fetch_raw(api, video_id, languages):
+    # youtube_transcript_api >= 1.0 is instance based; older releases expose a classmethod
+    if hasattr(api, "fetch"):
+        return api.fetch(video_id, languages=languages).to_raw_data()
+    return api.get_transcript(video_id, languages=languages)
+
+
+def _worker_loop():
+    from youtube_transcript_api import YouTubeTranscriptApi
+    try:
+        api = YouTubeTranscriptApi()
+    except TypeError:
+        api = YouTubeTranscriptApi
+
+    def handle(request):
+        try:
+            transcript = _fetch_raw(api, request["video_id"], request.get("languages") or ["en"])
+            return {"ok": True, "transcript": transcript}
+        except Exception as e:
+            return {"ok": False, "error": f"{e.__class__.__name__}: {str(e)[:300]}", "error_type": e.__class__.__name__}
+
+    serve(JsonLines, handle)
+
+
+if __name__ == "__main__":
+    _worker_loop()
@@ -0,0 +1,285 @@
+"""
+tiered link verification.
+
+tier 1 is a pooled http GET; tier 2 is the stealth chrome path. chrome only
+runs when the http answer can't be trusted (bot walls, js-rendered shells,
+network errors), so most links never touch a browser.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import metrics
+from admission import OverBudget
+from cooperative import offload
+from driver_pool import PoolExhausted
+from http_client import fetch_text
+from scheduler import Throttled
+
+logger = logging.getLogger("scraper")
+
+NSFW_TRIGGERS = ["over 18", "adult content", "nsfw", "click to enter", "mature content"]
+
+# pages that answer plain http with a challenge instead of content
+BOT_WALL_MARKERS = [
+    "captcha", "robot check", "are you a robot", "verify you are human",
+    "just a moment", "checking your browser", "unusual traffic",
+    "automated access", "security challenge", "please enable js",
+]
+
+# markup only present on interstitial challenge pages (cloudflare, perimeterx)
+BOT_WALL_MARKUP = ["_cf_chl_opt", "px-captcha"]
+
+# challenge pages are short; long pages mentioning "captcha" are usually real content
+BOT_WALL_MAX_TEXT = 3000
+
+# status codes that usually mean "blocked" rather than "dead"
+ESCALATE_STATUSES = {401, 403, 405, 406, 429, 451, 500, 502, 503, 520, 521, 522, 525}
+
+# below this much visible text a page with scripts is treated as a js shell
+JS_SHELL_TEXT_CHARS = 200
+
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+_tier_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+class Escalate(Exception):
+    """the http tier could not classify the page; chrome should take over"""
+
+
+def classify(url, final_url, title, body):
+    """
+    shared verdict rules for every tier.
+    returns (valid, reason) with reason None for live links.
+    """
+    title = (title or "").lower()
+    body = (body or "").strip().lower()
+
+    # check title for "access denied" or "404"
+    if "404" in title or "page not found" in title:
+        logger.info(f"link invalid (404 title): {url}")
+        return False, "404 Title"
+
+    # redirect detection
+    if "reddit.com" in url.lower() and "reddit.com" not in (final_url or "").lower():
+        return False, "Redirected outside domain"
+
+    # check for nsfw gates
+    if any(trigger in body for trigger in NSFW_TRIGGERS):
+        return False, "NSFW/Restricted Content"
+
+    if not body and "access denied" not in title:
+        return False, "Empty Body"
+
+    return True, None
+
+
+def _visible_text(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    script_count = len(soup.find_all("script"))
+    for tag in soup(["script", "style", "svg", "noscript", "template"]):
+        tag.decompose()
+    body = soup.body or soup
+    return body.get_text(separator=" ", strip=True), script_count
+
+
+def verify_http(url, timeout=8):
+    """tier 1: classify from status, final url, title and body of a plain GET"""
+    try:
+        resp, html = fetch_text(url, timeout=timeout)
+    except Exception as e:
+        raise Escalate(f"http error: {e.__class__.__name__}")
+
+    if resp.status_code in (404, 410):
+        return False, f"HTTP {resp.status_code}"
+    if resp.status_code in ESCALATE_STATUSES:
+        raise Escalate(f"status {resp.status_code}")
+    if resp.status_code >= 400:
+        return False, f"HTTP {resp.status_code}"
+
+    content_type = resp.headers.get("Content-Type", "").lower()
+    if content_type and "html" not in content_type:
+        # pdfs, images, json etc. are alive if they answered 2xx
+        return True, None
+
+    match = _TITLE_RE.search(html)
+    title = match.group(1).strip() if match else ""
+    text, script_count = offload(_visible_text, html)
+
+    lowered = html.lower()
+    suspect = (title + " " + text[:BOT_WALL_MAX_TEXT]).lower() if len(text) < BOT_WALL_MAX_TEXT else title.lower()
+    if any(marker in suspect for marker in BOT_WALL_MARKERS) or any(marker in lowered for marker in BOT_WALL_MARKUP):
+        raise Escalate("bot wall")
+
+    if len(text) < JS_SHELL_TEXT_CHARS and script_count:
+        raise Escalate("js-rendered body")
+
+    return classify(url, resp.url, title, text)
+
+
+def verify_chrome(url, browser):
+    """
+    tier 2: load the page in a pooled stealth browser.
+    `browser(url)` yields (driver, slot) once the domain's scheduler allows it.
+    """
+    from selenium.webdriver.common.by import By
+
+    with browser(url) as (driver, slot):
+        driver.set_page_load_timeout(30)
+
+        try:
+            driver.get(url)
+            time.sleep(random.uniform(2, 4)) # human pause
+
+            body = ""
+            try:
+                body = driver.find_element(By.TAG_NAME, "body").text
+            except:
+                pass
+
+            suspect = (driver.title + " " + body[:BOT_WALL_MAX_TEXT]).lower()
+            if len(body) < BOT_WALL_MAX_TEXT and any(marker in suspect for marker in BOT_WALL_MARKERS):
+                slot.report_block()
+
+            return classify(url, driver.current_url, driver.title, body)
+
+        except Exception as nav_err:
+            logger.warning(f"navigation error for {url}: {nav_err}")
+            return False, str(nav_err)
+
+
+def _record(tier):
+    with _stats_lock:
+        _tier_stats[tier] += 1
+
+
+def tier_stats():
+    """how often each tier produced the answer; chrome / total is the escalation rate"""
+    with _stats_lock:
+        return dict(_tier_stats)
+
+
+def verify_url(url, browser):
+    """
+    run the tiers in order and return the /verify response body.
+    the `tier` field says which tier answered.
+    """
+    try:
+        with metrics.stage("verify_http"):
+            valid, reason = verify_http(url)
+        _record("http")
+        result = {"valid": valid, "tier": "http"}
+        if reason:
+            result["reason"] = reason
+        return result
+    except Escalate as esc:
+        escalation = str(esc)
+        logger.info(f"escalating {url} to chrome: {escalation}")
+
+    try:
+        with metrics.stage("verify_chrome"):
+            valid, reason = verify_chrome(url, browser)
+        _record("chrome")
+        result = {"valid": valid, "tier": "chrome", "escalation": escalation}
+        if reason:
+            result["reason"] = reason
+        return result
+    except Throttled as e:
+        _record("throttled")
+        logger.warning(f"verification throttled: {e}")
+        if isinstance(e, OverBudget):
+            skipped = "server is out of memory headroom"
+        elif isinstance(e, PoolExhausted):
+            skipped = "all browsers are busy"
+        else:
+            skipped = "domain is throttled"
+        return {"valid": True, "tier": "chrome", "escalation": escalation,
+                "warning": f"Verification skipped, {skipped}"}
+    except Exception as e:
+        _record("chrome_error")
+        logger.error(f"verification driver error: {e}")
+        # always return valid=True on driver crash to not block user, but log it
+        return {"valid": True, "tier": "chrome", "escalation": escalation,
+                "warning": "Verification skipped due to driver error"}
+
+
+def _domain(url):
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def dedupe_urls(urls):
+    """strip and drop repeats while keeping first-seen order"""
+    seen = set()
+    unique = []
+    for url in urls:
+        url = (url or "").strip()
+        if url and url not in seen:
+            seen.add(url)
+            unique.append(url)
+    return unique
+
+
+def verify_many(urls, check, concurrency=8, per_domain=2):
+    """
+    verify `urls` concurrently with `check(url)` (verify_url plus whatever the
+    caller wraps around it) and yield ({"url": ...} | result) as each finishes.
+
+    at most `concurrency` checks run at once and at most `per_domain` of them
+    hit the same host; urls over their domain's cap wait without holding a
+    worker thread.
+    """
+    pending = defaultdict(deque)
+    order = []
+    for url in dedupe_urls(urls):
+        if not url.lower().startswith(("http://", "https://")):
+            yield {"url": url, "valid": False, "reason": "Invalid URL"}
+            continue
+        domain = _domain(url)
+        if domain not in pending:
+            order.append(domain)
+        pending[domain].append(url)
+
+    in_flight = defaultdict(int)
+    running = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="verify")
+    try:
+        while pending or running:
+            # fill free slots round-robin across domains that are under their cap
+            progressed = True
+            while len(running) < concurrency and progressed:
+                progressed = False
+                for domain in list(order):
+                    if len(running) >= concurrency:
+                        break
+                    if in_flight[domain] >= per_domain or domain not in pending:
+                        continue
+                    url = pending[domain].popleft()
+                    if not pending[domain]:
+                        del pending[domain]
+                        order.remove(domain)
+                    in_flight[domain] += 1
+                    running[executor.submit(check, url)] = (url, domain)
+                    progressed = True
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, domain = running.pop(future)
+                in_flight[domain] -= 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"batch verify failed for {url}: {e}")
+                    result = {"valid": True, "warning": "Verification skipped due to internal error"}
+                yield {"url": url, **result}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,451 @@
+"""
+key frame extraction for /tools/video_insight.
+
+the stream mode resolves the progressive mp4 url with yt-dlp and hands opencv
+a file-like reader that fetches only the byte ranges the decoder asks for
+(the moov index plus the gop around each seek target) through the pooled
+http session, keeping at most a few blocks in memory. the download mode is
+the old path (whole file to disk, then seek) and stays as the fallback for
+formats without range support; every download gets its own temp dir, so
+concurrent requests never share a file.
+
+which frames to keep is decided by frame_select (scored candidates) unless
+the request asks for the fixed 10/50/80% positions.
+
+decoding, resizing and jpeg encoding run in decode_workers' worker
+processes (VIDEO_DECODE_WORKERS, one by default). frames come back as jpeg
+bytes together with a report of what was fetched.
+"""
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from decode_workers import DecodeError, pool_from_env as decode_pool_from_env
+from http_client import get_session
+
+logger = logging.getLogger("scraper")
+
+# fixed selection: grab at 10%, 50%, 80% marks
+DEFAULT_POSITIONS = (0.1, 0.5, 0.8)
+FRAME_SIZE = (640, 360)
+JPEG_QUALITY = 85
+
+# smart selection: frames returned, sampling time budget in seconds, candidates sampled
+DEFAULT_K = 3
+MAX_K = 8
+DEFAULT_BUDGET_S = 8.0
+MAX_BUDGET_S = 30.0
+MAX_SAMPLES = 32
+
+# progressive mp4 over plain https first; dash/hls formats can't be range-read
+STREAM_FORMAT = "worst[ext=mp4][protocol^=http][acodec!=none]/worst[ext=mp4][protocol^=http]/worst[ext=mp4]"
+
+_local = threading.local()
+
+
+def default_mode():
+    """VIDEO_FRAME_MODE: stream (default) or download"""
+    return os.environ.get("VIDEO_FRAME_MODE", "stream")
+
+
+def _ydl():
+    ydl = getattr(_local, "ydl", None)
+    if ydl is None:
+        import yt_dlp
+        ydl = yt_dlp.YoutubeDL({"format": STREAM_FORMAT, "quiet": True, "no_warnings": True})
+        _local.ydl = ydl
+    return ydl
+
+
+def resolve_stream(video_url):
+    """direct media url, request headers, size and duration for the chosen format (no download)"""
+    info = _ydl().extract_info(video_url, download=False)
+    fmt = info.get("requested_formats", [info])[0] if "url" not in info else info
+    if not fmt.get("url"):
+        raise IOError(f"format {fmt.get('format_id')} has no direct url")
+    return {
+        "url": fmt["url"],
+        "headers": fmt.get("http_headers") or info.get("http_headers") or {},
+        # exact size only; without it RangeReader reads the real one from the first Content-Range
+        "filesize": fmt.get("filesize"),
+        "duration": info.get("duration"),
+        "format_id": fmt.get("format_id"),
+    }
+
+
+class RangeReader(io.BufferedIOBase):
+    """
+    seekable read-only view of a remote file over http range requests.
+    reads are served from an lru of `max_blocks` blocks of `block_size` bytes.
+    """
+
+    def __init__(self, url, size=None, headers=None, block_size=256 * 1024, max_blocks=32, timeout=15):
+        super().__init__()
+        self.url = url
+        self.headers = dict(headers or {})
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.timeout = timeout
+        self.size = size
+        self.pos = 0
+
+        self.bytes_fetched = 0
+        self.requests = 0
+        self.fetch_s = 0.0
+        self._blocks = OrderedDict()
+
+        if self.size is None:
+            # the first block's Content-Range tells us the total size
+            self._block(0)
+
+    def _block(self, index):
+        block = self._blocks.get(index)
+        if block is not None:
+            self._blocks.move_to_end(index)
+            return block
+
+        start = index * self.block_size
+        end = start + self.block_size - 1
+        if self.size is not None:
+            end = min(end, self.size - 1)
+
+        started = time.perf_counter()
+        resp = get_session().get(
+            self.url,
+            headers={**self.headers, "Range": f"bytes={start}-{end}"},
+            timeout=self.timeout,
+        )
+        self.fetch_s += time.perf_counter() - started
+        self.requests += 1
+        if resp.status_code != 206:
+            raise IOError(f"range request answered {resp.status_code}")
+
+        block = resp.content
+        self.bytes_fetched += len(block)
+        if self.size is None:
+            total = resp.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+            if not total.isdigit():
+                raise IOError("server did not report the file size")
+            self.size = int(total)
+
+        self._blocks[index] = block
+        if len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.pos = max(0, offset)
+        return self.pos
+
+    def read(self, n=-1):
+        if self.pos >= self.size:
+            return b""
+        if n is None or n < 0:
+            n = self.size - self.pos
+        n = min(n, self.size - self.pos)
+
+        out = []
+        while n > 0:
+            index, offset = divmod(self.pos, self.block_size)
+            chunk = self._block(index)[offset:offset + n]
+            if not chunk:
+                break
+            out.append(chunk)
+            self.pos += len(chunk)
+            n -= len(chunk)
+        return b"".join(out)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def selection_from(data):
+    """
+    {"selection": "smart"|"fixed", "k": 3, "budget": 8} from a request body, clamped.
+    raises ValueError on bad values.
+    """
+    selection = data.get("selection") or os.environ.get("VIDEO_FRAME_SELECTION", "smart")
+    if selection not in ("smart", "fixed"):
+        raise ValueError(f"Unknown frame selection: {selection} (known: smart, fixed)")
+    try:
+        k = int(data.get("k", DEFAULT_K))
+        budget = float(data.get("budget", DEFAULT_BUDGET_S))
+    except (TypeError, ValueError):
+        raise ValueError("k must be an integer and budget a number of seconds")
+    return {"selection": selection, "k": max(1, min(k, MAX_K)), "budget": max(0.5, min(budget, MAX_BUDGET_S))}
+
+
+def _duration(cap, duration=None):
+    import cv2
+
+    if duration:
+        return duration
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    return cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps if fps else 0
+
+
+def _read_at(cap, seconds):
+    """frame at `seconds`, resized for gemini (it only needs small imgs), or None"""
+    import cv2
+
+    cap.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+    ret, frame = cap.read()
+    return cv2.resize(frame, FRAME_SIZE) if ret else None
+
+
+def _jpeg(frame):
+    import cv2
+
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return buffer.tobytes() if ok else None
+
+
+def grab_frames(cap, positions, duration=None):
+    """seek by timestamp to each position (0-1); returns (jpeg frames, picks)"""
+    duration = _duration(cap, duration)
+    frames, picks = [], []
+    for percent in positions:
+        frame = _read_at(cap, duration * percent)
+        jpeg = _jpeg(frame) if frame is not None else None
+        if jpeg:
+            frames.append(jpeg)
+            picks.append({"t_s": round(duration * percent, 1)})
+    return frames, picks
+
+
+def select_frames(cap, duration=None, k=DEFAULT_K, budget=DEFAULT_BUDGET_S):
+    """
+    sample candidates across the video until `budget` seconds pass, score their
+    thumbnails (frame_select) and keep the k best distinct ones.
+    returns (jpeg frames, picks); picks describe the chosen frames.
+    """
+    import cv2
+    import numpy as np
+
+    import frame_select
+
+    duration = _duration(cap, duration)
+    n = min(MAX_SAMPLES, max(4 * k, 8))
+    # skip the first/last 3%: intros and end cards
+    times = [duration * (0.03 + 0.94 * (i + 0.5) / n) for i in range(n)]
+
+    deadline = time.perf_counter() + budget
+    frames = {}
+    for i in frame_select.sample_order(n):
+        if frames and time.perf_counter() >= deadline:
+            break
+        frame = _read_at(cap, times[i])
+        if frame is not None:
+            frames[i] = frame
+    if not frames:
+        return [], []
+
+    sampled = sorted(frames)
+    thumbs = np.stack([
+        cv2.resize(cv2.cvtColor(frames[i], cv2.COLOR_BGR2GRAY), frame_select.THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        for i in sampled
+    ])
+    sample_times = [times[i] for i in sampled]
+    scores, hists, metrics = frame_select.score_thumbnails(thumbs)
+
+    min_gap = duration / (3 * k) if duration else 0
+    chosen = frame_select.choose(scores, hists, sample_times, k, min_gap)
+    if not chosen:
+        # everything looked black; fall back to the brightest distinct samples
+        chosen = frame_select.choose(metrics["non_black"], hists, sample_times, k, min_gap)
+
+    jpegs, picks = [], []
+    for c in chosen:
+        jpeg = _jpeg(frames[sampled[c]])
+        if jpeg:
+            jpegs.append(jpeg)
+            picks.append({
+                "t_s": round(sample_times[c], 1),
+                "score": round(float(scores[c]), 3) if np.isfinite(scores[c]) else None,
+                "sharpness": round(float(metrics["sharpness"][c]), 1),
+                "non_black": round(float(metrics["non_black"][c]), 3),
+            })
+    return jpegs, picks
+
+
+def pick_frames(cap, duration, selection):
+    """(jpeg frames, report fields) for a selection spec from selection_from"""
+    if selection["selection"] == "fixed":
+        frames, picks = grab_frames(cap, DEFAULT_POSITIONS, duration)
+        return frames, {"selection": "fixed", "picked": picks}
+    started = time.perf_counter()
+    frames, picks = select_frames(cap, duration, selection["k"], selection["budget"])
+    return frames, {
+        "selection": "smart",
+        "k": selection["k"],
+        "select_s": round(time.perf_counter() - started, 3),
+        "picked": picks,
+    }
+
+
+def _decode_stream(url, headers, filesize, duration, selection):
+    """decode worker task: range-read and decode a remote mp4; returns (frames, fetch stats)"""
+    import cv2
+
+    started = time.perf_counter()
+    reader = RangeReader(url, size=filesize, headers=headers)
+    if hasattr(cv2, "IStreamReader"):
+        cap = cv2.VideoCapture(reader, cv2.CAP_FFMPEG, [])
+    else:
+        # older opencv can't read python streams; ffmpeg does its own range requests (bytes unknown)
+        reader = None
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+    try:
+        if not cap.isOpened():
+            raise IOError("opencv could not open the stream")
+        frames, picked = pick_frames(cap, duration, selection)
+    finally:
+        cap.release()
+    elapsed = time.perf_counter() - started
+
+    return frames, {
+        **picked,
+        "source_bytes": reader.size if reader else filesize,
+        "bytes_downloaded": reader.bytes_fetched if reader else None,
+        "http_requests": reader.requests if reader else None,
+        "download_s": round(reader.fetch_s, 3) if reader else None,
+        "decode_s": round(elapsed - (reader.fetch_s if reader else 0), 3),
+    }
+
+
+def _decode_file(path, selection):
+    """decode worker task: decode a local file; returns (frames, report fields)"""
+    import cv2
+
+    started = time.perf_counter()
+    cap = cv2.VideoCapture(path)
+    try:
+        frames, picked = pick_frames(cap, None, selection)
+    finally:
+        cap.release()
+    return frames, {**picked, "decode_s": round(time.perf_counter() - started, 3)}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def decode_pool():
+    """the decode worker pool, created on first use; its processes start per decode as needed"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = decode_pool_from_env()
+        return _pool
+
+
+def shutdown():
+    with _pool_lock:
+        pool = _pool
+    if pool is not None:
+        pool.shutdown()
+
+
+def stats():
+    return decode_pool().stats()
+
+
+def frames_stream(video_url, selection):
+    """(jpeg frames, report) decoding only the ranges the seeks touch"""
+    started = time.perf_counter()
+    stream = resolve_stream(video_url)
+    resolve_s = time.perf_counter() - started
+
+    frames, report = decode_pool().run(
+        "_decode_stream", stream["url"], stream["headers"], stream["filesize"], stream["duration"], selection
+    )
+    return frames, {"mode": "stream", "format_id": stream["format_id"], "resolve_s": round(resolve_s, 3), **report}
+
+
+def frames_download(video_url, selection):
+    """(jpeg frames, report) after downloading the whole file into a private scratch dir (fallback)"""
+    import yt_dlp
+
+    # one directory per request, removed with everything in it however we leave
+    with tempfile.TemporaryDirectory(prefix="skeptek-video-") as workspace:
+        ydl_opts = {
+            'format': 'worst[ext=mp4]', # we just need visual context, not 4k
+            'outtmpl': os.path.join(workspace, 'video.%(ext)s'),
+            'quiet': True,
+            'no_warnings': True
+        }
+
+        started = time.perf_counter()
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.download([video_url])
+        download_s = time.perf_counter() - started
+
+        files = os.listdir(workspace)
+        if not files:
+            raise IOError("yt-dlp produced no file")
+        path = os.path.join(workspace, files[0])
+        size = os.path.getsize(path)
+
+        frames, report = decode_pool().run("_decode_file", path, selection)
+
+    return frames, {
+        "mode": "download",
+        "source_bytes": size,
+        "bytes_downloaded": size,
+        "download_s": round(download_s, 3),
+        **report,
+    }
+
+
+def _fallback_errors():
+    """stream mode failures a full download may get past: http / range trouble and formats yt-dlp won't hand out"""
+    from yt_dlp.utils import DownloadError
+    return (OSError, DownloadError)
+
+
+def extract_frames(video_url, mode=None, selection=None):
+    """
+    stream mode with the full download as fallback; returns (jpeg frames, report).
+    only stream, range and format errors fall back; DecodeUnavailable (busy or
+    crashed workers) and anything else propagate to the caller.
+    """
+    mode = mode or default_mode()
+    selection = selection or selection_from({})
+    if mode == "stream":
+        try:
+            frames, report = frames_stream(video_url, selection)
+            if frames:
+                return frames, report
+            logger.warning("stream mode decoded no frames, downloading the video instead")
+        except DecodeError as e:
+            if not e.io_error:
+                raise
+            logger.warning(f"stream decode failed ({e}), downloading the video instead")
+        except _fallback_errors() as e:
+            logger.warning(f"stream frame extraction failed ({e}), downloading the video instead")
+    elif mode != "download":
+        raise ValueError(f"Unknown frame mode: {mode} (known: stream, download)")
+
+    frames, report = frames_download(video_url, selection)
+    if mode == "stream":
+        report["fallback"] = True
+    return frames, report
@@ -1,14 +1,46 @@
-from main import app
-from waitress import serve
+import os
+
+# SERVER_MODE=threads (default): waitress with a fixed thread pool.
+# SERVER_MODE=gevent: one event loop, a greenlet per connection. gevent must
+# patch the stdlib before anything else imports socket or threading.
+SERVER_MODE = os.environ.get("SERVER_MODE", "threads").lower()
+if SERVER_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+elif SERVER_MODE != "threads":
+    raise SystemExit(f"unknown SERVER_MODE {SERVER_MODE!r} (threads or gevent)")
+
+from main import app, driver_pool, transcript_workers
+import bootstrap
 import logging
 
-import os
+
+def run(app, host, port):
+    logger = logging.getLogger("waitress")
+    if SERVER_MODE == "gevent":
+        from gevent.pool import Pool
+        from gevent.pywsgi import WSGIServer
+
+        # waiting requests are cheap greenlets; browsers (DRIVER_POOL_SIZE) and
+        # cpu work (CPU_WORKERS) keep their own limits
+        connections = int(os.environ.get("GEVENT_MAX_CONNECTIONS", 1000))
+        logger.info(f"🚀 skeptek backend starting in PRODUCTION mode with gevent ({connections} connections)...")
+        WSGIServer((host, port), app, spawn=Pool(connections), log=None).serve_forever()
+    else:
+        from waitress import serve
+
+        # threads=8 is a good default for I/O bound tasks like scraping
+        threads = int(os.environ.get("WAITRESS_THREADS", 8))
+        logger.info("🚀 skeptek backend starting in PRODUCTION mode with Waitress...")
+        serve(app, host=host, port=port, threads=threads)
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger("waitress")
-    logger.info("🚀 skeptek backend starting in PRODUCTION mode with Waitress...")
-    
-    port = int(os.environ.get("PORT", 8000))
-    # threads=8 is a good default for I/O bound tasks like scraping
-    serve(app, host="0.0.0.0", port=port, threads=8)
+
+    # pre-launch chrome so the first scrape doesn't pay the cold start
+    driver_pool.warm_up(int(os.environ.get("DRIVER_POOL_WARM", 1)))
+    transcript_workers.warm_up(1)
+
+    logging.getLogger("waitress").info(f"ready to serve {bootstrap.since_process_start():.2f}s after process start")
+    run(app, "0.0.0.0", int(os.environ.get("PORT", 8000)))
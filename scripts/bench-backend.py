@@ -0,0 +1,481 @@
+"""
+offline load test for the backend against local fixture sites.
+
+starts a fixture server that imitates the sites the backend talks to, boots
+the flask app in a child process wired to it, then drives each endpoint at a
+fixed concurrency and reports p50/p95 latency, throughput, peak rss (app plus
+its chrome / worker children) and the mean Server-Timing stages.
+
+fixture server:
+    /amazon/dp/<id>, /shopee/product/<id>, /lazada/products/<id>
+        the saved product pages from scripts/fixtures plus an injected signup
+        popup and xhr-loaded review pages, so scrolling keeps growing the page
+    /gone/<id>                     404 for dead-link checks
+    /ddg/html/?q=...               duckduckgo html-style results for reddit search
+    /stub/transcript/<video_id>    raw transcript list (404 for ids starting "nocap")
+    /stub/captions/<video_id>.json3  json3 caption file for the yt-dlp fallback
+
+the transcript worker pool and yt-dlp's page extraction are replaced by http
+calls to the stubs in the app process, so /transcript measures the cache,
+coalescing and json3 parsing around them rather than youtube.
+
+usage (from the repo root):
+    python scripts/bench-backend.py [--concurrency 8] [--requests 40] [--distinct 40]
+        [--endpoints verify,market,reddit,transcript,scrape] [--latency-ms 40] [--server-mode gevent]
+        [--save bench.json] [--compare bench.json --tolerance 0.25]
+
+--distinct below --requests repeats keys, exercising the caches and
+singleflight instead of the cold path. /scrape needs chrome; without it those
+requests show up as errors. --compare exits 1 when an endpoint's p95 grew by
+more than --tolerance over the saved run.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+import psutil
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+FIXTURES = os.path.join(ROOT, "scripts", "fixtures")
+
+SHOPS = {
+    "amazon": ("amazon-product.html", "/amazon/dp/{id}"),
+    "shopee": ("shopee-product.html", "/shopee/product/{id}"),
+    "lazada": ("lazada-product.html", "/lazada/products/{id}"),
+}
+
+# review pages each product page pulls in over xhr while being scrolled
+REVIEW_PAGES = 4
+
+# injected into every product page: a signup modal and xhr review pagination
+_PAGE_JS = """
+<script>
+(function () {
+  setTimeout(function () {
+    var modal = document.createElement('div');
+    modal.className = 'signup-popup';
+    modal.style.cssText = 'position:fixed;inset:0;background:rgba(0,0,0,.5);z-index:999';
+    modal.innerHTML = '<div class="popup-body">Sign up for 10%% off <button class="close">&times;</button></div>';
+    modal.querySelector('.close').onclick = function () { modal.remove(); };
+    document.body.appendChild(modal);
+  }, 250);
+  var list = document.querySelector('#cm-cr-dp-review-list, #ratings, #reviews'), page = 0, loading = false;
+  if (!list) return;
+  window.addEventListener('scroll', function () {
+    if (loading || page >= %(pages)d || window.innerHeight + window.scrollY < document.body.scrollHeight - 800) return;
+    loading = true;
+    fetch('/reviews/%(shop)s?page=' + (++page)).then(function (r) { return r.text(); }).then(function (html) {
+      list.insertAdjacentHTML('beforeend', html);
+      loading = false;
+    });
+  });
+})();
+</script>
+"""
+
+REVIEW_BODIES = [
+    "Noise cancelling is strong on the train, but the case zipper broke in week two.",
+    "Battery easily lasts a week of commuting. The app keeps asking me to sign in.",
+    "Sounds great for the price. Right earcup creaks when I turn my head.",
+    "Seller shipped fast and the box was sealed. Calls sound muffled outdoors.",
+    "Returned it: the left side cut out after a firmware update.",
+]
+
+
+def review_page(shop, page):
+    items = []
+    for i in range(10):
+        body = REVIEW_BODIES[(page + i) % len(REVIEW_BODIES)]
+        items.append(
+            f'<div class="review review-item shopee-product-rating" data-hook="review">'
+            f'<span class="a-profile-name">{shop}_buyer_{page}_{i}</span>'
+            f'<span data-hook="review-body">{body}</span></div>'
+        )
+    return "\n".join(items)
+
+
+def ddg_results(query, count=8):
+    """a duckduckgo html result page; reddit links wrapped in //duckduckgo.com/l/?uddg= like the real one"""
+    seed = hashlib.sha1(query.encode("utf-8")).hexdigest()
+    rows = []
+    for i in range(count):
+        thread_id = seed[i * 4:i * 4 + 6]
+        if i % 3 == 2:
+            target = f"https://www.example.com/blog/{thread_id}"
+        else:
+            target = f"https://www.reddit.com/r/headphones/comments/{thread_id}/acme_noiseguard_700_thoughts_{i}/"
+        rows.append(
+            f'<div class="result results_links web-result"><h2 class="result__title">'
+            f'<a rel="nofollow" class="result__a" href="//duckduckgo.com/l/?uddg={quote(target, safe="")}&amp;rut={seed}">'
+            f'Acme NoiseGuard 700 thoughts #{i} : r/headphones</a></h2>'
+            f'<a class="result__snippet">Has anyone had the hinge crack? {query}</a></div>'
+        )
+    return f"<html><head><title>{query} at DuckDuckGo</title></head><body><div id=\"links\">{''.join(rows)}</div></body></html>"
+
+
+def transcript_segments(video_id, count=400):
+    return [
+        {"text": f"segment {i} of {video_id}: the noise cancelling holds up on flights", "start": i * 4.2, "duration": 4.0}
+        for i in range(count)
+    ]
+
+
+def json3_captions(video_id, count=400):
+    events = [
+        {"tStartMs": i * 4200, "dDurationMs": 4000, "segs": [{"utf8": f"caption {i} of {video_id}: "}, {"utf8": "battery lasts a week"}]}
+        for i in range(count)
+    ]
+    return json.dumps({"wireMagic": "pb3", "events": events})
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    pages = {}
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(self.path)
+        path, query = parts.path, parse_qs(parts.query)
+        segments = path.strip("/").split("/")
+
+        if segments[0] in SHOPS and len(segments) == 3:
+            return self._send(200, self.pages[segments[0]])
+        if segments[0] == "reviews" and len(segments) == 2:
+            return self._send(200, review_page(segments[1], int(query.get("page", ["1"])[0])))
+        if segments[0] == "gone":
+            return self._send(404, "<html><head><title>Page Not Found</title></head><body>Sorry, we couldn't find that page.</body></html>")
+        if path.rstrip("/") == "/ddg/html":
+            return self._send(200, ddg_results(query.get("q", [""])[0]))
+        if segments[:2] == ["stub", "transcript"] and len(segments) == 3:
+            if segments[2].startswith("nocap"):
+                return self._send(404, '{"error": "TranscriptsDisabled"}', "application/json")
+            return self._send(200, json.dumps(transcript_segments(segments[2])), "application/json")
+        if segments[:2] == ["stub", "captions"] and len(segments) == 3:
+            return self._send(200, json3_captions(segments[2].rsplit(".", 1)[0]), "application/json")
+        return self._send(404, "not found", "text/plain")
+
+
+def start_fixture_server(latency_ms):
+    pages = {}
+    for shop, (filename, _) in SHOPS.items():
+        with open(os.path.join(FIXTURES, filename), encoding="utf-8") as f:
+            html = f.read()
+        script = _PAGE_JS % {"shop": shop, "pages": REVIEW_PAGES}
+        pages[shop] = re.sub(r"</body>", lambda m: script + m.group(0), html, count=1, flags=re.IGNORECASE)
+
+    handler = type("Handler", (FixtureHandler,), {"pages": pages, "latency": latency_ms / 1000})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# app side (child process)
+
+def serve_app(port, fixture_url):
+    """the app served by wsgi.py (SERVER_MODE picks the server), with transcript sources pointed at the stubs"""
+    sys.path.insert(0, BACKEND)
+    import wsgi  # first: patches the stdlib under SERVER_MODE=gevent
+
+    import captions
+    import main
+    from http_client import get_session
+    from transcript_workers import TranscriptError
+
+    def stub_transcript(video_id, languages=("en",)):
+        resp = get_session().get(f"{fixture_url}/stub/transcript/{video_id}", timeout=10)
+        if resp.status_code != 200:
+            raise TranscriptError(f"stub answered {resp.status_code}", kind=resp.json().get("error"))
+        return resp.json()
+
+    def stub_captions(video_id, lang="en"):
+        return captions.fetch_json3(f"{fixture_url}/stub/captions/{video_id}.json3")
+
+    main.transcript_workers.fetch = stub_transcript
+    main.fetch_transcript_ytdlp = stub_captions
+
+    wsgi.run(main.app, "127.0.0.1", port)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(fixture_url, server_mode, threads, workdir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        REDDIT_SEARCH_DDG_URL=f"{fixture_url}/ddg/html/",
+        TRANSCRIPT_CACHE_DIR=os.path.join(workdir, "transcripts"),
+        SERVER_MODE=server_mode,
+        WAITRESS_THREADS=str(threads),
+    )
+    log = open(os.path.join(workdir, "app.log"), "wb")
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve-app", str(port), fixture_url],
+        env=env, stdout=log, stderr=subprocess.STDOUT, cwd=BACKEND,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"app exited with code {proc.returncode}, see {log.name}")
+        try:
+            if requests.get(f"{base}/health", timeout=2).ok:
+                return proc, base, log.name
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"app did not come up within 60s, see {log.name}")
+
+
+# load side
+
+def shop_url(fixture_url, key):
+    shop = list(SHOPS)[key % len(SHOPS)]
+    return fixture_url + SHOPS[shop][1].format(id=f"B0{key:08d}")
+
+
+def endpoints(fixture_url):
+    """name -> (method, path, body) builders keyed by a request key"""
+    def verify_target(key):
+        return f"{fixture_url}/gone/{key}" if key % 5 == 4 else shop_url(fixture_url, key)
+
+    def video_id(key):
+        return f"{'nocap' if key % 4 == 3 else 'vid'}{key:06d}"
+
+    return {
+        "verify": lambda k: ("POST", "/verify", {"url": verify_target(k)}),
+        "verify_batch": lambda k: ("POST", "/verify/batch", {"urls": [verify_target(k * 10 + i) for i in range(10)]}),
+        "market": lambda k: ("POST", "/tools/market_deep_dive", {"url": shop_url(fixture_url, k)}),
+        "reddit": lambda k: ("POST", "/tools/reddit_search", {"query": f"acme noiseguard 700 review {k}"}),
+        "reddit_batch": lambda k: (
+            "POST", "/tools/reddit_search/batch",
+            {"queries": [f"acme noiseguard 700 {k} {suffix}" for suffix in ("review", "problems", "vs sony")]},
+        ),
+        "transcript": lambda k: ("GET", f"/transcript?video_id={video_id(k)}", None),
+        "scrape": lambda k: ("GET", f"/scrape?url={quote(shop_url(fixture_url, k), safe='')}", None),
+    }
+
+
+class RssSampler:
+    """peak rss of a process and all of its children, sampled in the background"""
+
+    def __init__(self, pid, interval=0.02):
+        self.proc = psutil.Process(pid)
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        total = 0
+        for p in [self.proc] + self.proc.children(recursive=True):
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+
+def parse_server_timing(header):
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        match = re.search(r"dur=([\d.]+)", params)
+        if name and match:
+            stages[name] = float(match.group(1))
+    return stages
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_endpoint(base, build, count, distinct, concurrency, sampler, timeout):
+    local = threading.local()
+
+    def one(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, body = build(i % distinct)
+        started = time.perf_counter()
+        try:
+            resp = session.request(method, base + path, json=body, timeout=timeout)
+            resp.content  # streamed routes (ndjson) finish here
+            status = resp.status_code
+            timing = parse_server_timing(resp.headers.get("Server-Timing"))
+        except requests.RequestException as e:
+            status, timing = e.__class__.__name__, {}
+        return time.perf_counter() - started, status, timing
+
+    with sampler, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = time.perf_counter()
+        results = list(executor.map(one, range(count)))
+        wall = time.perf_counter() - started
+
+    latencies = [r[0] * 1000 for r in results]
+    statuses = {}
+    stages = {}
+    for _, status, timing in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        for name, ms in timing.items():
+            stages.setdefault(name, []).append(ms)
+
+    return {
+        "requests": count,
+        "ok": sum(1 for _, s, _ in results if isinstance(s, int) and s < 400),
+        "statuses": statuses,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "max_ms": max(latencies),
+        "throughput_rps": count / wall if wall else 0.0,
+        "peak_rss_mb": sampler.peak / (1024 * 1024),
+        # averaged over every request, so a stage only some requests hit weighs accordingly
+        "stages_ms": {name: sum(values) / count for name, values in stages.items()},
+    }
+
+
+def print_report(report):
+    print(f"\n{'endpoint':<14}{'ok':>9}{'p50':>11}{'p95':>11}{'max':>11}{'req/s':>9}{'peak rss':>11}  statuses")
+    for name, r in report.items():
+        statuses = " ".join(f"{k}x{v}" for k, v in sorted(r["statuses"].items()))
+        print(
+            f"{name:<14}{r['ok']:>4}/{r['requests']:<4}{r['p50_ms']:>9.1f}ms{r['p95_ms']:>9.1f}ms"
+            f"{r['max_ms']:>9.1f}ms{r['throughput_rps']:>9.1f}{r['peak_rss_mb']:>9.0f}MB  {statuses}"
+        )
+
+    print("\nmean Server-Timing per request (ms)")
+    for name, r in report.items():
+        stages = sorted(r["stages_ms"].items(), key=lambda kv: kv[0] == "total")
+        print(f"  {name:<14}" + ", ".join(f"{stage} {ms:.1f}" for stage, ms in stages))
+
+
+def compare(report, baseline, tolerance):
+    """endpoints whose p95 grew by more than `tolerance` (a fraction) over the baseline"""
+    regressions = []
+    for name, r in report.items():
+        before = baseline.get(name)
+        if before and before["p95_ms"] > 0 and r["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append((name, before["p95_ms"], r["p95_ms"]))
+    return regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve-app":
+        serve_app(int(sys.argv[2]), sys.argv[3])
+        return 0
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--endpoints", default="verify,verify_batch,market,reddit,reddit_batch,transcript,scrape")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=40, help="requests per endpoint")
+    parser.add_argument("--distinct", type=int, default=0, help="distinct keys per endpoint (default: all distinct)")
+    parser.add_argument("--latency-ms", type=float, default=40, help="added fixture server latency")
+    parser.add_argument("--server-mode", choices=["threads", "gevent"], default="threads", help="SERVER_MODE for wsgi.py")
+    parser.add_argument("--threads", type=int, default=8, help="waitress threads in threads mode")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--save")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    builders = endpoints("")
+    names = [n.strip() for n in args.endpoints.split(",") if n.strip()]
+    unknown = [n for n in names if n not in builders]
+    if unknown:
+        print(f"unknown endpoints: {', '.join(unknown)} (known: {', '.join(builders)})")
+        return 2
+
+    fixture_server, fixture_url = start_fixture_server(args.latency_ms)
+    workdir = tempfile.mkdtemp(prefix="skeptek-bench-")
+    proc, base, log_path = start_app(fixture_url, args.server_mode, args.threads, workdir)
+    builders = endpoints(fixture_url)
+    distinct = args.distinct or args.requests
+
+    print(f"fixtures {fixture_url} (+{args.latency_ms:.0f}ms) | app {base} | log {log_path}")
+    print(f"server={args.server_mode} concurrency={args.concurrency} requests={args.requests} distinct={distinct}")
+
+    report = {}
+    try:
+        sampler = RssSampler(proc.pid)
+        for name in names:
+            report[name] = run_endpoint(base, builders[name], args.requests, distinct, args.concurrency, sampler, args.timeout)
+            print(f"  {name} done in p95 {report[name]['p95_ms']:.0f}ms")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        fixture_server.shutdown()
+
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nsaved {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p95 {before:.1f}ms -> {after:.1f}ms")
+        if regressions:
+            return 1
+        print(f"\nno p95 regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
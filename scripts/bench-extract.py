@@ -0,0 +1,76 @@
+"""
+benchmark the /scrape text extraction engines on the saved fixture pages.
+
+usage (from the repo root):
+    python scripts/bench-extract.py [--scale 40] [--runs 5] [--budget 20000]
+
+--scale repeats each page's review block to approximate the multi-MB
+page_source of a fully scrolled product page.
+"""
+import argparse
+import glob
+import os
+import re
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from extract import ENGINES  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "scripts", "fixtures")
+
+
+def inflate(html, scale):
+    """duplicate the body content `scale` times, keeping one <body> element"""
+    match = re.search(r"<body[^>]*>(.*)</body>", html, re.IGNORECASE | re.DOTALL)
+    if not match or scale <= 1:
+        return html
+    inner = match.group(1)
+    return html[:match.start(1)] + inner * scale + html[match.end(1):]
+
+
+def bench(fn, html, budget, runs):
+    timings = []
+    out = ""
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = fn(html, budget)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=20000)
+    args = parser.parse_args()
+
+    pages = sorted(glob.glob(os.path.join(FIXTURES, "*.html")))
+    if not pages:
+        print(f"no fixtures in {FIXTURES}")
+        return 1
+
+    print(f"engines: {', '.join(ENGINES)} | scale={args.scale} runs={args.runs} budget={args.budget}\n")
+    print(f"{'fixture':<24}{'size':>10}  " + "".join(f"{name:>14}" for name in ENGINES) + "   parity")
+
+    for path in pages:
+        with open(path, encoding="utf-8") as f:
+            html = inflate(f.read(), args.scale)
+
+        results = {name: bench(fn, html, args.budget, args.runs) for name, fn in ENGINES.items()}
+        reference = results["bs4"][1]
+        parity = all(out == reference for _, out in results.values())
+
+        row = f"{os.path.basename(path):<24}{len(html) / 1024:>8.0f}KB  "
+        row += "".join(f"{ms:>12.1f}ms" for ms, _ in results.values())
+        print(row + ("   ok" if parity else "   DIFF"))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,8 @@ import os
 
 # Add project root to path
 sys.path.append(os.getcwd())
+# backend modules import each other as siblings (from driver_pool import ..., import bootstrap)
+sys.path.insert(0, os.path.join(os.getcwd(), "backend"))
 
 try:
     print("re-importing backend.main...")